@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Measures how long it takes to import neonx and which heavy dependencies
+are loaded along the way. Each import runs in a fresh interpreter::
+
+    python benchmarks/import_time.py [repetitions]
+"""
+
+from __future__ import print_function
+
+import subprocess
+import sys
+
+
+STATEMENTS = [
+    'import neonx',
+    'from neonx import get_geoff',
+    'from neonx import write_to_neo',
+    'from neonx import get_neo_graph; get_neo_graph.__module__',
+]
+
+HEAVY_MODULES = ['networkx', 'requests']
+
+SCRIPT = """
+import sys, time
+start = time.time()
+{0}
+elapsed = time.time() - start
+print(elapsed, ','.join(m for m in {1!r} if m in sys.modules))
+"""
+
+
+def measure(statement, repetitions):
+    """returns the best import time in seconds and the heavy modules loaded
+    by `statement`."""
+    best, loaded = None, ''
+    for _ in range(repetitions):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT.format(statement, HEAVY_MODULES)])
+        elapsed, _, loaded = output.decode('utf-8').strip().partition(' ')
+        elapsed = float(elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+
+def main(repetitions=5):
+    for statement in STATEMENTS:
+        elapsed, loaded = measure(statement, repetitions)
+        print('{0:8.1f} ms  {1:<60} {2}'.format(
+            elapsed * 1000, statement, loaded or '-'))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -1,12 +1,49 @@
-
 # -*- coding: utf-8 -*-
 
 __author__ = 'Rohit Aggarwal'
 __email__ = 'rohit.neonx@mailnull.com'
 __version__ = '0.2.0'
 
-__all__ = ['get_geoff', 'write_to_neo', 'get_neo_graph']
+__all__ = ['get_geoff', 'write_to_neo', 'get_neo_graph', 'get_neo_subgraph',
+           'write_to_neo_pipelined', 'clear_label', 'replace_label']
+
+import sys
+
+
+# The public functions are imported on first use, so that `import neonx`
+# stays cheap for programs that only need some of them.
+LAZY_ATTRIBUTES = {
+    'get_geoff': 'geoff',
+    'write_to_neo': 'neo',
+    'get_neo_graph': 'neo',
+    'get_neo_subgraph': 'neo',
+    'write_to_neo_pipelined': 'pipeline',
+    'clear_label': 'neo',
+    'replace_label': 'neo',
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(
+            "module 'neonx' has no attribute '{0}'".format(name))
+
+    from importlib import import_module
+
+    value = getattr(import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
 
 
-from .geoff import get_geoff
-from .neo import write_to_neo, get_neo_graph
+if sys.version_info < (3, 7):
+    # module level __getattr__ (PEP 562) is not supported
+    from .geoff import get_geoff
+    from .neo import (write_to_neo, get_neo_graph, get_neo_subgraph,
+                      clear_label, replace_label)
+    from .pipeline import write_to_neo_pipelined
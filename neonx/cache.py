@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+
+
+__all__ = ['GraphCache']
+
+
+SNAPSHOT_SUFFIX = '.graph'
+SNAPSHOT_VERSION = 2
+
+
+def get_cache_key(server_url, label, **query):
+    """computes the cache key of a `get_neo_graph` call.
+
+    :param server_url: Server URL for the Neo4j server.
+    :param label: The label of the retrieved nodes.
+    :param query: The remaining query parameters (properties, filters etc.)
+    :rtype: a hexadecimal string
+    """
+    key = json.dumps([server_url, label, query], sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def dump_graph(graph):
+    """converts a graph into a compressed binary snapshot. The snapshot is
+    JSON, so loading it cannot run code, unlike a pickle.
+
+    :param graph: A NetworkX DiGraph, keyed on Neo4j node IDs
+    :rtype: bytes
+    """
+    data = [list(graph.nodes(data=True)), list(graph.edges(data=True))]
+    return zlib.compress(json.dumps(data).encode('utf-8'))
+
+
+def load_graph(snapshot):
+    """converts a binary snapshot back into a graph.
+
+    :param snapshot: bytes created by `dump_graph()`
+    :rtype: A NetworkX DiGraph
+    """
+    import networkx as nx
+
+    nodes, edges = json.loads(zlib.decompress(snapshot).decode('utf-8'))
+    graph = nx.DiGraph()
+    graph.add_nodes_from((node_id, properties)
+                         for node_id, properties in nodes)
+    graph.add_edges_from((from_id, to_id, properties)
+                         for from_id, to_id, properties in edges)
+    return graph
+
+
+class GraphCache(object):
+    """An on-disk cache of graphs retrieved by `get_neo_graph`. The code
+    below shows a simple example::
+
+        from neonx import get_neo_graph
+        from neonx.cache import GraphCache
+
+        cache = GraphCache(os.path.expanduser('~/.cache/neonx'),
+                           max_size=2 ** 30)
+        graph = get_neo_graph("http://localhost:7474/db/data/", 'Person',
+                              'neo4j', 'secret', cache=cache)
+
+    Before a cached graph is reused, the number of nodes of the label,
+    their highest ID and the number of their outgoing relationships are
+    compared with the values at the time the graph was stored (see
+    `neonx.neo.get_label_marker`). This takes a scan of the label's nodes,
+    but not of their relationships. Changes that leave these values
+    untouched (e.g. property updates or a relationship replaced by
+    another) are not detected, so `max_age` can be used to limit how long
+    a cached graph is reused.
+
+    If the size of all cached graphs exceeds `max_size` bytes, the least
+    recently used graphs are removed.
+
+    The directory is created readable by its owner only. Use a directory
+    of your own rather than a shared one like /tmp, where other users
+    could place snapshots of their choice.
+
+    :param directory: The directory to store the graphs in.
+    :param optional max_size: The maximum size of the cache in bytes.
+        Defaults to no limit.
+    :param optional max_age: The maximum age of a cached graph in seconds.
+        Defaults to no limit.
+    """
+
+    def __init__(self, directory, max_size=None, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+    def get_path(self, key):
+        """returns the path of the snapshot for `key`."""
+        return os.path.join(self.directory, key + SNAPSHOT_SUFFIX)
+
+    def load(self, key, marker):
+        """returns the cached graph for `key`, if it is still fresh.
+
+        :param key: a key returned by `get_cache_key()`
+        :param marker: the current change marker of the label
+        :rtype: A NetworkX DiGraph or None
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                if (header['version'] != SNAPSHOT_VERSION or
+                        header['marker'] != marker):
+                    return None
+                if (self.max_age is not None and
+                        time.time() - header['created'] > self.max_age):
+                    return None
+                graph = load_graph(f.read())
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                zlib.error):
+            # missing, stale or corrupt snapshots are cache misses
+            return None
+
+        os.utime(path, None)
+        return graph
+
+    def store(self, key, marker, graph):
+        """stores `graph` under `key` and evicts old graphs, if the cache
+        is too large.
+
+        :param key: a key returned by `get_cache_key()`
+        :param marker: the current change marker of the label
+        :param graph: A NetworkX DiGraph
+        """
+        header = {'version': SNAPSHOT_VERSION, 'marker': marker,
+                  'created': time.time()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(dump_graph(graph))
+        os.rename(tmp_path, self.get_path(key))
+
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """removes the least recently used graphs until the cache is no
+        larger than `max_size`.
+
+        :param optional keep: a key that must not be removed
+        """
+        if self.max_size is None:
+            return
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SNAPSHOT_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if keep is not None and path == self.get_path(keep):
+                continue
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        """removes all cached graphs."""
+        for name in os.listdir(self.directory):
+            if name.endswith(SNAPSHOT_SUFFIX):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+"""The ``neonx`` command line tool. Run ``neonx --help`` for the list of
+subcommands and ``neonx <subcommand> --help`` for their options.
+
+The user name and password of the Neo4j server can be given as options or
+in the `NEO4J_USER` and `NEO4J_PASS` environment variables.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gzip
+import io
+import os
+import sys
+import time
+
+from .cypher import write_cypher
+from .export import write_csv, write_shards
+from .geoff import get_geoff
+from .neo import get_neo_graph, write_to_neo
+from .pipeline import write_to_neo_pipelined
+from .source import GraphSource, as_source, read_csv, read_edgelist
+
+
+__all__ = ['main']
+
+
+FORMATS = ['edgelist', 'csv', 'graphml', 'gml']
+
+
+def get_format(path, file_format=None):
+    """returns the format of a graph file, guessed from its extension if
+    `file_format` is not given.
+
+    :param path: the path of the file
+    :param optional file_format: one of `FORMATS`
+    :rtype: a string
+    """
+    if file_format:
+        return file_format
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    return extension if extension in FORMATS else 'edgelist'
+
+
+def read_graph(args):
+    """opens the input graph of a subcommand. Edge lists and CSV files are
+    streamed, GraphML and GML files are read into a NetworkX graph.
+
+    :param args: the parsed command line arguments
+    :rtype: A `GraphSource`
+    """
+    file_format = get_format(args.input, args.format)
+    nodetype = int if args.int_nodes else None
+    directed = not args.undirected
+
+    if file_format == 'csv':
+        return read_csv(args.input, nodes_path=args.nodes, nodetype=nodetype,
+                        directed=directed)
+    if file_format == 'edgelist':
+        return read_edgelist(args.input, nodetype=nodetype,
+                             directed=directed)
+    import networkx as nx
+
+    if file_format == 'graphml':
+        return as_source(nx.read_graphml(args.input))
+    return as_source(nx.read_gml(args.input))
+
+
+def open_output(path, compress):
+    """opens an output text file, gzip compressed if `compress` is set.
+
+    :param path: the path of the file. '.gz' is appended when compressing.
+    :param compress: True, to compress the file
+    :rtype: a file object
+    """
+    if compress:
+        if not path.endswith('.gz'):
+            path += '.gz'
+        return io.TextIOWrapper(gzip.open(path, 'wb'), encoding='utf-8',
+                                newline='')
+    return io.open(path, 'w', encoding='utf-8', newline='')
+
+
+class Stats(object):
+    """counts the nodes and relationships processed by a subcommand and
+    prints progress and summary lines to stderr."""
+
+    def __init__(self, show_progress=False):
+        self.show_progress = show_progress
+        self.counts = {'nodes': 0, 'relationships': 0}
+        self.start = time.time()
+
+    def __call__(self, kind, count):
+        """adds `count` nodes or relationships."""
+        self.set(kind, self.counts[kind] + count)
+
+    def set(self, kind, total):
+        """sets the number of nodes or relationships processed so far."""
+        self.counts[kind] = total
+        if self.show_progress:
+            print('\r{0} nodes, {1} relationships'.format(
+                self.counts['nodes'], self.counts['relationships']),
+                end='', file=sys.stderr)
+            sys.stderr.flush()
+
+    def report(self):
+        """prints the counts and the throughput."""
+        if self.show_progress:
+            print(file=sys.stderr)
+        elapsed = time.time() - self.start
+        total = self.counts['nodes'] + self.counts['relationships']
+        print('{0} nodes, {1} relationships in {2:.2f}s ({3:.0f}/s)'.format(
+            self.counts['nodes'], self.counts['relationships'], elapsed,
+            total / elapsed if elapsed else 0), file=sys.stderr)
+
+    def count(self, source, every=10000):
+        """wraps a `GraphSource`, so that its nodes and edges are counted
+        while they are read.
+
+        :param source: A `GraphSource`
+        :param optional every: the number of items between progress updates
+        :rtype: A `GraphSource`
+        """
+        def counted(kind, items):
+            i = 0
+            for i, item in enumerate(items, 1):
+                yield item
+                if i % every == 0:
+                    self.set(kind, i)
+            self.set(kind, i)
+
+        return GraphSource(nodes=lambda: counted('nodes', source.nodes()),
+                           edges=lambda: counted('relationships',
+                                                 source.edges()),
+                           directed=source.is_directed())
+
+
+def upload(args):
+    stats = Stats(args.progress)
+    if args.processes:
+        write_to_neo_pipelined(args.server_url, read_graph(args), args.user,
+                               args.password, edge_rel_name=args.rel_name,
+                               label=args.label, edge_rel_key=args.rel_key,
+                               chunk_size=args.chunk_size,
+                               processes=args.processes,
+                               senders=args.workers, progress=stats,
+                               response='counts',
+                               partition_edges=args.partition_edges)
+    else:
+        write_to_neo(args.server_url, read_graph(args), args.user,
+                     args.password, edge_rel_name=args.rel_name,
+                     label=args.label, edge_rel_key=args.rel_key,
+                     chunk_size=args.chunk_size, workers=args.workers,
+                     progress=stats, response='counts',
+                     partition_edges=args.partition_edges,
+                     merge_key=args.merge_key)
+    if args.stats:
+        stats.report()
+
+
+def download(args):
+    import networkx as nx
+
+    stats = Stats(args.progress)
+    graph = get_neo_graph(args.server_url, args.label, args.user,
+                          args.password, rel_types=args.rel_types)
+    stats.set('nodes', graph.number_of_nodes())
+    stats.set('relationships', graph.number_of_edges())
+
+    file_format = get_format(args.output, args.format)
+    path = args.output
+    if args.compress and file_format != 'csv' and not path.endswith('.gz'):
+        path += '.gz'
+
+    if file_format == 'csv':
+        write_csv_files(graph, args.output, args.compress,
+                        edge_rel_key='neo_rel_name', label=args.label)
+    elif file_format == 'graphml':
+        nx.write_graphml(graph, path)
+    elif file_format == 'gml':
+        nx.write_gml(graph, path)
+    else:
+        nx.write_edgelist(graph, path)
+    if args.stats:
+        stats.report()
+
+
+def geoff(args):
+    stats = Stats(args.progress)
+    source = stats.count(read_graph(args))
+    with open_output(args.output, args.compress) as f:
+        f.write(get_geoff(source, args.rel_name, edge_rel_key=args.rel_key))
+    if args.stats:
+        stats.report()
+
+
+def write_cypher_files(graph, directory, compress, shards, **kwargs):
+    """writes `graph` into the files nodes-<i>.cypher and
+    relationships-<i>.cypher in `directory`, for i in 0 to `shards` - 1.
+    The keyword arguments are passed on to `write_cypher`."""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    files = []
+    try:
+        for kind in ('nodes', 'relationships'):
+            for i in range(shards):
+                path = os.path.join(directory,
+                                    '{0}-{1}.cypher'.format(kind, i))
+                files.append(open_output(path, compress))
+        write_cypher(graph, files[:shards], files[shards:], **kwargs)
+    finally:
+        for f in files:
+            f.close()
+
+
+def cypher(args):
+    stats = Stats(args.progress)
+    source = stats.count(read_graph(args))
+    kwargs = dict(edge_rel_name=args.rel_name, label=args.label,
+                  edge_rel_key=args.rel_key, batch_size=args.batch_size,
+                  commit_size=args.commit_size)
+    if args.shards > 1:
+        write_cypher_files(source, args.output, args.compress, args.shards,
+                           **kwargs)
+    else:
+        with open_output(args.output, args.compress) as f:
+            write_cypher(source, f, **kwargs)
+    if args.stats:
+        stats.report()
+
+
+def write_csv_files(graph, directory, compress, **kwargs):
+    """writes `graph` into the files nodes.csv and relationships.csv in
+    `directory`. The keyword arguments are passed on to `write_csv`."""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    nodes_path = os.path.join(directory, 'nodes.csv')
+    edges_path = os.path.join(directory, 'relationships.csv')
+    with open_output(nodes_path, compress) as nodes_file:
+        with open_output(edges_path, compress) as edges_file:
+            write_csv(graph, nodes_file, edges_file, **kwargs)
+
+
+def csv_export(args):
+    stats = Stats(args.progress)
+    source = stats.count(read_graph(args))
+    write_csv_files(source, args.output, args.compress,
+                    edge_rel_name=args.rel_name, label=args.label,
+                    edge_rel_key=args.rel_key)
+    if args.stats:
+        stats.report()
+
+
+def batch_export(args):
+    stats = Stats(args.progress)
+    source = stats.count(read_graph(args))
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    paths = [os.path.join(args.output, 'shard-{0}.json.gz'.format(i))
+             for i in range(args.shards)]
+    write_shards(source, paths, edge_rel_name=args.rel_name,
+                 label=args.label, edge_rel_key=args.rel_key,
+                 batch_size=args.batch_size, processes=args.processes)
+    if args.stats:
+        stats.report()
+
+
+def get_parser():
+    """builds the parser of the command line arguments.
+
+    :rtype: an `argparse.ArgumentParser`
+    """
+    parser = argparse.ArgumentParser(
+        prog='neonx', description='Moves graphs between files and Neo4j.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--progress', action='store_true',
+                        help='print progress to stderr')
+    common.add_argument('--stats', action='store_true',
+                        help='print counts and throughput to stderr')
+
+    server = argparse.ArgumentParser(add_help=False)
+    server.add_argument('server_url', help='URL of the Neo4j server, e.g. '
+                        'http://localhost:7474/db/data/')
+    server.add_argument('--user', default=os.environ.get('NEO4J_USER'),
+                        help='Neo4j user name (default: $NEO4J_USER)')
+    server.add_argument('--password', default=os.environ.get('NEO4J_PASS'),
+                        help='Neo4j password (default: $NEO4J_PASS)')
+
+    graph_input = argparse.ArgumentParser(add_help=False)
+    graph_input.add_argument('input', help='graph file, optionally gzipped')
+    graph_input.add_argument('--format', choices=FORMATS,
+                             help='input format (default: from extension)')
+    graph_input.add_argument('--nodes', help='CSV file of nodes')
+    graph_input.add_argument('--int-nodes', action='store_true',
+                             help='read node names as integers')
+    graph_input.add_argument('--undirected', action='store_true',
+                             help='create each edge in both directions')
+
+    relationships = argparse.ArgumentParser(add_help=False)
+    relationships.add_argument('--rel-name', help='relationship name')
+    relationships.add_argument('--rel-key',
+                               help='edge attribute holding the relationship '
+                               'name (falls back to --rel-name)')
+
+    p = subparsers.add_parser('upload',
+                              parents=[server, graph_input, relationships,
+                                       common],
+                              help='upload a graph file to Neo4j')
+    p.add_argument('--label', help='label added to all nodes')
+    p.add_argument('--chunk-size', type=int, default=10000,
+                   help='nodes or edges per request (default: 10000)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='concurrent requests (default: 1)')
+    p.add_argument('--processes', type=int, default=0,
+                   help='serialize chunks in this many processes while '
+                   'sending (default: serialize in the sending threads)')
+    p.add_argument('--partition-edges', action='store_true',
+                   help='send relationships in rounds of batches that do '
+                   'not share nodes, to avoid lock contention')
+    p.add_argument('--merge-key',
+                   help='node attribute identifying a node; existing nodes '
+                   'with --label are updated instead of duplicated')
+    p.set_defaults(func=upload)
+
+    p = subparsers.add_parser('download', parents=[server, common],
+                              help='download a label from Neo4j')
+    p.add_argument('label', help='label of the nodes')
+    p.add_argument('output', help='output file (or directory for csv)')
+    p.add_argument('--format', choices=FORMATS,
+                   help='output format (default: from extension)')
+    p.add_argument('--rel-types', nargs='+', metavar='TYPE',
+                   help='relationship types to download')
+    p.add_argument('--compress', action='store_true',
+                   help='gzip the output')
+    p.set_defaults(func=download)
+
+    p = subparsers.add_parser('geoff', parents=[graph_input, common],
+                              help='convert a graph file to Geoff')
+    p.add_argument('output', help='output file')
+    p.add_argument('--rel-name', default='LINKS_TO',
+                   help='relationship name (default: LINKS_TO)')
+    p.add_argument('--rel-key',
+                   help='edge attribute holding the relationship name '
+                   '(falls back to --rel-name)')
+    p.add_argument('--compress', action='store_true',
+                   help='gzip the output')
+    p.set_defaults(func=geoff)
+
+    p = subparsers.add_parser('cypher',
+                              parents=[graph_input, relationships, common],
+                              help='convert a graph file to a Cypher script '
+                              'for cypher-shell')
+    p.add_argument('output', help='output file (or directory for --shards)')
+    p.add_argument('--label', required=True,
+                   help='label added to all nodes and used to find them')
+    p.add_argument('--batch-size', type=int, default=1000,
+                   help='nodes or edges per UNWIND (default: 1000)')
+    p.add_argument('--commit-size', type=int, default=10000,
+                   help='nodes or edges per transaction (default: 10000)')
+    p.add_argument('--shards', type=int, default=1,
+                   help='split into this many node and relationship '
+                   'scripts that can be replayed in parallel')
+    p.add_argument('--compress', action='store_true',
+                   help='gzip the output')
+    p.set_defaults(func=cypher)
+
+    p = subparsers.add_parser('csv-export',
+                              parents=[graph_input, relationships, common],
+                              help='convert a graph file to CSV files for '
+                              'neo4j-admin import')
+    p.add_argument('output', help='output directory')
+    p.add_argument('--label', help='label added to all nodes')
+    p.add_argument('--compress', action='store_true',
+                   help='gzip the output')
+    p.set_defaults(func=csv_export)
+
+    p = subparsers.add_parser('batch-export',
+                              parents=[graph_input, relationships, common],
+                              help='convert a graph file to gzipped batch '
+                              'requests for the batch endpoint')
+    p.add_argument('output', help='output directory')
+    p.add_argument('--label', required=True,
+                   help='label added to all nodes and used to find them')
+    p.add_argument('--shards', type=int, default=1,
+                   help='split into this many files, which can be loaded '
+                   'in any order or concurrently')
+    p.add_argument('--batch-size', type=int, default=1000,
+                   help='nodes or relationships per Cypher query '
+                   '(default: 1000)')
+    p.add_argument('--processes', type=int, default=0,
+                   help='encode the files in this many processes '
+                   '(default: encode in the writing threads)')
+    p.set_defaults(func=batch_export)
+
+    return parser
+
+
+def main(argv=None):
+    """runs the ``neonx`` command line tool.
+
+    :param optional argv: the command line arguments. Defaults to
+        `sys.argv`.
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if (getattr(args, 'rel_name', '') is None and
+            getattr(args, 'rel_key', '') is None):
+        parser.error('--rel-name or --rel-key is required')
+    if getattr(args, 'merge_key', None) and args.processes:
+        parser.error('--merge-key cannot be combined with --processes')
+    if getattr(args, 'merge_key', None) and not args.label:
+        parser.error('--merge-key requires --label')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from .encoders import iter_converted
+from .neo import get_rel_name, quote_name
+from .source import as_source, chunks
+
+
+__all__ = ['write_cypher']
+
+
+try:
+    string_types = basestring
+    integer_types = (int, long)
+except NameError:
+    string_types = str
+    integer_types = (int, )
+
+
+INDEX_STMT = """CREATE INDEX IF NOT EXISTS FOR (n{0}) ON (n.{1});"""
+AWAIT_STMT = """CALL db.awaitIndexes();"""
+NODE_STMT = """UNWIND $batch AS row CREATE (n{0} {{{1}: row.id}}) \
+SET n += row.properties;"""
+EDGE_STMT = """UNWIND $batch AS row \
+MATCH (a{0} {{{1}: row.start}}) MATCH (b{0} {{{1}: row.end}}) \
+CREATE (a)-[r:{2}]->(b) SET r += row.properties;"""
+
+
+def get_literal(value, encoder):
+    """converts a property value into a Cypher literal.
+
+    :param value: a property value
+    :param encoder: a JSONEncoder object, whose ``default`` method converts
+        values of other than the JSON types
+    :rtype: a string
+    """
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, string_types):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, integer_types):
+        return str(value)
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError('{0} has no Cypher literal'.format(value))
+        return repr(value).replace('e+', 'e')
+    if isinstance(value, dict):
+        return '{{{0}}}'.format(', '.join(
+            '{0}: {1}'.format(quote_name(str(k)), get_literal(v, encoder))
+            for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return '[{0}]'.format(', '.join(get_literal(v, encoder)
+                                        for v in value))
+    return get_literal(encoder.default(value), encoder)
+
+
+class ScriptWriter(object):
+    """writes batches of rows into a cypher-shell script. Each batch is set
+    as the parameter ``batch`` and processed by an ``UNWIND`` statement.
+    Transactions are committed after at least `commit_size` rows.
+
+    :param file: a text file object
+    :param commit_size: the number of rows per transaction
+    """
+
+    def __init__(self, file, commit_size):
+        self.file = file
+        self.commit_size = commit_size
+        self.rows = 0
+        self.in_transaction = False
+
+    def write(self, line):
+        """writes a line outside of the batches, e.g. a schema statement.
+        """
+        self.file.write(line + '\n')
+
+    def write_batch(self, statement, rows, encoder):
+        """writes a batch of rows and the statement processing them.
+
+        :param statement: a Cypher statement reading the rows from
+            ``$batch``
+        :param rows: a list of dictionaries
+        :param encoder: a JSONEncoder object
+        """
+        if not self.in_transaction:
+            self.write(':begin')
+            self.in_transaction = True
+        self.write(':param batch => ' + get_literal(rows, encoder))
+        self.write(statement)
+        self.rows += len(rows)
+        if self.rows >= self.commit_size:
+            self.commit()
+
+    def commit(self):
+        """commits the open transaction, if there is one."""
+        if self.in_transaction:
+            self.write(':commit')
+            self.in_transaction = False
+            self.rows = 0
+
+
+def write_cypher(graph, files, edge_files=None, edge_rel_name=None,
+                 label=None, encoder=None, edge_rel_key=None,
+                 batch_size=1000, commit_size=10000, id_key='_neonx_id'):
+    """Write the `graph` as a Cypher script for ``cypher-shell``, which
+    loads it without a connection from neonx to the server::
+
+        from neonx.cypher import write_cypher
+
+        with open('graph.cypher', 'w') as f:
+            write_cypher(G, f, edge_rel_name='LINKS_TO', label='Node')
+
+        # cypher-shell -u neo4j -p secret -f graph.cypher
+
+    The nodes and edges are sent in parameters of at most `batch_size` rows
+    each (``:param batch => [...]``), which are created by an
+    ``UNWIND $batch`` statement. A transaction is committed every
+    `commit_size` rows. The script is written while the graph is read, so
+    only one batch per relationship name is kept in memory.
+
+    The relationships find their nodes by the `label` and the property
+    `id_key`, which holds the node name. The script starts with an index on
+    them, so that each relationship looks up its nodes in the index. The
+    label also keeps the relationships away from nodes of other loads with
+    the same names. The property can be removed after loading, e.g. with
+    ``MATCH (n:Node) REMOVE n._neonx_id``.
+
+    To replay in parallel, pass lists of files as `files` and `edge_files`.
+    The batches of nodes and relationships are spread over them in turn.
+    Run all node scripts, then all relationship scripts, concurrently.
+
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
+    :param files: A text file object or a list of them.
+    :param optional edge_files: A text file object or a list of them for
+        the relationships. Defaults to writing them after the nodes, which
+        needs a single file in `files`.
+    :param optional edge_rel_name: Relationship name between the nodes.
+    :param label: Label added to all nodes.
+    :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :param optional batch_size: Maximum number of rows per ``UNWIND``.
+    :param optional commit_size: Number of rows per transaction.
+    :param optional id_key: The node property holding the node name.
+    :rtype: A dictionary with the number of written 'nodes' and
+        'relationships'.
+    """
+    if encoder is None:
+        encoder = json.JSONEncoder()
+
+    if edge_rel_name is None and edge_rel_key is None:
+        raise ValueError(
+            'Must provide either `edge_rel_name` or `edge_rel_key`')
+    if not label:
+        raise ValueError('Must provide a `label` to find the nodes by')
+
+    if not isinstance(files, (list, tuple)):
+        files = [files]
+    if edge_files is None:
+        if len(files) > 1:
+            raise ValueError('Several node files need `edge_files`')
+        edge_files = files
+    elif not isinstance(edge_files, (list, tuple)):
+        edge_files = [edge_files]
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+    counts = {'nodes': 0, 'relationships': 0}
+
+    writers = [ScriptWriter(f, commit_size) for f in files]
+    if edge_files is files:
+        edge_writers = writers
+    else:
+        edge_writers = [ScriptWriter(f, commit_size) for f in edge_files]
+
+    quoted_label = ':' + quote_name(label)
+    id_key = quote_name(id_key)
+    writers[0].write(INDEX_STMT.format(quoted_label, id_key))
+
+    statement = NODE_STMT.format(quoted_label, id_key)
+    nodes = iter_converted(source.nodes(), encoder)
+    for i, chunk in enumerate(chunks(nodes, batch_size)):
+        writers[i % len(writers)].write_batch(
+            statement, [{'id': node_name, 'properties': properties}
+                        for node_name, properties in chunk], encoder)
+        counts['nodes'] += len(chunk)
+    for writer in writers:
+        writer.commit()
+
+    for writer in edge_writers:
+        writer.write(AWAIT_STMT)
+
+    pending = {}
+    written = [0]
+
+    def flush(ename):
+        statement = EDGE_STMT.format(quoted_label, id_key, quote_name(ename))
+        writer = edge_writers[written[0] % len(edge_writers)]
+        writer.write_batch(statement, pending.pop(ename), encoder)
+        written[0] += 1
+
+    for from_node, to_node, properties in iter_converted(source.edges(),
+                                                         encoder):
+        ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+        ends = [(from_node, to_node)]
+        if not is_digraph:
+            ends.append((to_node, from_node))
+        for start, end in ends:
+            rows = pending.setdefault(ename, [])
+            rows.append({'start': start, 'end': end,
+                         'properties': properties})
+            counts['relationships'] += 1
+            if len(rows) >= batch_size:
+                flush(ename)
+    for ename in sorted(pending):
+        flush(ename)
+    for writer in edge_writers:
+        writer.commit()
+
+    return counts
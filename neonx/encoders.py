@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+
+from .source import chunks
+
+
+__all__ = ['ScientificEncoder']
+
+
+CONVERT_CHUNK_SIZE = 10000
+
+try:
+    NATIVE_TYPES = frozenset([str, unicode, int, long, float, bool,
+                              type(None), list, tuple, dict])
+except NameError:
+    NATIVE_TYPES = frozenset([str, int, float, bool, type(None), list, tuple,
+                              dict])
+
+
+def get_numpy():
+    """imports NumPy on first use.
+
+    :rtype: the numpy module or None, if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def iter_converted(items, encoder, size=CONVERT_CHUNK_SIZE):
+    """converts the properties of nodes or edges in chunks of `size` items,
+    if `encoder` provides a ``convert_properties`` method (like
+    `ScientificEncoder`). Otherwise, the items are returned unchanged.
+
+    :param items: an iterable of tuples whose last element is a dictionary
+        of properties
+    :param encoder: a JSONEncoder object
+    :param optional size: the number of items converted at once
+    :rtype: an iterator of tuples
+    """
+    convert = getattr(encoder, 'convert_properties', None)
+    if convert is None:
+        return iter(items)
+    return (item[:-1] + (properties, )
+            for chunk in chunks(items, size)
+            for item, properties in zip(chunk, convert(
+                [item[-1] for item in chunk])))
+
+
+class ScientificEncoder(json.JSONEncoder):
+    """A JSON encoder for property values from NumPy and pandas: NumPy
+    scalars and arrays, `numpy.datetime64`, pandas timestamps and Python
+    dates and datetimes (as ISO 8601 strings). Missing timestamps (NaT)
+    become null::
+
+        from neonx import write_to_neo
+        from neonx.encoders import ScientificEncoder
+
+        results = write_to_neo("http://localhost:7474/db/data/", G, 'neo4j',
+                               'secret', 'LINKS_TO',
+                               encoder=ScientificEncoder())
+
+    `get_geoff`, `write_to_neo` and the other serializers hand the
+    properties of whole chunks of nodes and edges to `convert_properties`,
+    which converts all values of a property and type with a single NumPy
+    call. `default` only handles the values nested in lists or
+    dictionaries.
+    """
+
+    def convert_properties(self, rows):
+        """converts the values of a list of property dictionaries into
+        JSON encodable values. Dictionaries that contain such values are
+        copied, the others are returned unchanged.
+
+        :param rows: a list of property dictionaries
+        :rtype: a list of property dictionaries
+        """
+        columns = {}
+        for i, row in enumerate(rows):
+            for key, value in row.items():
+                if type(value) not in NATIVE_TYPES:
+                    column = columns.setdefault((key, type(value)), ([], []))
+                    column[0].append(i)
+                    column[1].append(value)
+
+        if not columns:
+            return rows
+
+        rows = list(rows)
+        copied = set()
+        for (key, value_type), (indices, values) in columns.items():
+            converted = self.convert_column(value_type, values)
+            for i, value in zip(indices, converted):
+                if i not in copied:
+                    rows[i] = dict(rows[i])
+                    copied.add(i)
+                rows[i][key] = value
+        return rows
+
+    def convert_column(self, value_type, values):
+        """converts values of the same type.
+
+        :param value_type: the type of all `values`
+        :param values: a list of values
+        :rtype: a list of JSON encodable values
+        """
+        np = get_numpy()
+
+        if np is not None:
+            if issubclass(value_type, np.datetime64):
+                return self.convert_datetimes(np, np.array(values))
+            if issubclass(value_type, np.generic):
+                return np.array(values).tolist()
+            if issubclass(value_type, np.ndarray):
+                return [value.tolist() for value in values]
+            if (issubclass(value_type, datetime.date) and
+                    not any(getattr(v, 'tzinfo', None) for v in values)):
+                if hasattr(value_type, 'to_datetime64'):
+                    # pandas' Timestamp keeps nanoseconds
+                    values = [v.to_datetime64() for v in values]
+                    dtype = 'datetime64[ns]'
+                elif issubclass(value_type, datetime.datetime):
+                    dtype = 'datetime64[us]'
+                else:
+                    dtype = 'datetime64[D]'
+                try:
+                    array = np.array(values, dtype=dtype)
+                except (TypeError, ValueError):
+                    pass    # e.g. pandas' NaT, converted below
+                else:
+                    return self.convert_datetimes(np, array)
+
+        return [self.convert_value(value) for value in values]
+
+    def convert_datetimes(self, np, array):
+        """converts an array of `numpy.datetime64` into ISO 8601 strings,
+        without fractional seconds if there are none.
+
+        :param np: the numpy module
+        :param array: a `numpy.datetime64` array
+        :rtype: a list of strings or None (for NaT)
+        """
+        unit = np.datetime_data(array.dtype)[0]
+        if unit not in ('Y', 'M', 'W', 'D'):
+            seconds = array.astype('datetime64[s]')
+            same = (seconds == array) | np.isnat(array)
+            unit = 's' if same.all() else None
+        strings = np.datetime_as_string(array, unit=unit).tolist()
+        return [None if s == 'NaT' else s for s in strings]
+
+    def convert_value(self, value):
+        """converts a single value into a JSON encodable value. Values
+        that cannot be converted are returned unchanged.
+
+        :param value: a property value
+        :rtype: a JSON encodable value
+        """
+        if hasattr(value, 'isoformat'):
+            if value != value:  # NaT
+                return None
+            return value.isoformat()
+        if hasattr(value, 'tolist'):
+            np = get_numpy()
+            if isinstance(value, np.datetime64):
+                # like a column, as tolist() turns nanoseconds into an int
+                return self.convert_datetimes(np, np.array([value]))[0]
+            converted = value.tolist()
+            if hasattr(converted, 'isoformat'):
+                return converted.isoformat()
+            return converted
+        return value
+
+    def default(self, o):
+        converted = self.convert_value(o)
+        if converted is o:
+            return json.JSONEncoder.default(self, o)
+        return converted
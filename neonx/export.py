@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import json
+import multiprocessing
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from . import neo
+from .encoders import iter_converted
+from .neo import get_rel_name
+from .source import as_source, chunks
+
+
+__all__ = ['write_csv', 'write_shards']
+
+
+BLOCK_LINES = 1000
+SHARD_NODE_QRY = """UNWIND {{rows}} AS row MERGE (n{0} {{{1}: row.id}}) \
+SET n += row.properties;"""
+SHARD_REL_QRY = """UNWIND {{rows}} AS row \
+MERGE (a{0} {{{1}: row.start}}) MERGE (b{0} {{{1}: row.end}}) \
+MERGE (a)-[r:{2}]->(b) SET r += row.properties;"""
+
+
+try:
+    string_types = basestring
+    integer_types = (int, long)
+except NameError:
+    string_types = str
+    integer_types = (int, )
+
+
+def get_type(value):
+    """returns the ``neo4j-admin import`` type of a property value.
+
+    :param value: a property value, converted to JSON types
+    :rtype: 'boolean', 'long', 'double', 'string', an array type like
+        'long[]', None for an empty list or 'json' for values without a
+        type, which are written as JSON text
+    """
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, integer_types):
+        return 'long'
+    if isinstance(value, float):
+        return 'double'
+    if isinstance(value, string_types):
+        return 'string'
+    if isinstance(value, (list, tuple)):
+        element_type = combine_types(set(get_type(v) for v in value))
+        if element_type is None:
+            return None
+        if element_type == 'json' or element_type.endswith('[]'):
+            return 'json'
+        return element_type + '[]'
+    return 'json'
+
+
+def combine_types(types):
+    """returns a type that holds the values of all `types`.
+
+    :param types: a set of types returned by `get_type()`
+    :rtype: a type or None, if there are no values
+    """
+    types = types - set([None])
+    if not types:
+        return None
+    if len(types) == 1:
+        return types.pop()
+    arrays = set(t[:-2] for t in types if t.endswith('[]'))
+    if len(arrays) == len(types):
+        element_type = combine_types(arrays)
+        return 'json' if element_type == 'json' else element_type + '[]'
+    if types == set(['long', 'double']):
+        return 'double'
+    return 'json'
+
+
+def get_columns(items):
+    """collects the property names of nodes or edges and the types of
+    their values. Longs and doubles in the same column are doubles, other
+    mixtures are written as JSON text.
+
+    :param items: an iterable of tuples whose last element is a dictionary
+        of properties
+    :rtype: a list of (property name, type) tuples, sorted by name
+    """
+    columns = {}
+    for item in items:
+        for k, v in item[-1].items():
+            if v is not None:
+                columns.setdefault(k, set()).add(get_type(v))
+    return [(k, combine_types(types)) for k, types in sorted(columns.items())]
+
+
+def get_header(columns):
+    """returns the header fields of typed columns. Strings and JSON text
+    are left without a type, as strings are the default.
+
+    :param columns: a list of (property name, type) tuples
+    :rtype: a list of strings
+    """
+    return [k if t in (None, 'string', 'json') else '{0}:{1}'.format(k, t)
+            for k, t in columns]
+
+
+def get_value(value, encoder, array_delimiter=None):
+    """converts a property value into a CSV field. Strings are written as
+    they are, the elements of arrays are joined by `array_delimiter`, and
+    everything else is JSON encoded.
+
+    :param value: a property value or None
+    :param encoder: a JSONEncoder object
+    :param optional array_delimiter: the delimiter of array elements, if
+        the value belongs to an array column
+    :rtype: a string
+    """
+    if value is None:
+        return ''
+    if isinstance(value, string_types):
+        return value
+    if array_delimiter is not None:
+        return array_delimiter.join(get_value(v, encoder) for v in value)
+    return encoder.encode(value)
+
+
+def get_row(properties, columns, encoder, array_delimiter):
+    """converts the properties of a node or edge into CSV fields.
+
+    :param properties: a dictionary of properties
+    :param columns: a list of (property name, type) tuples
+    :param encoder: a JSONEncoder object
+    :param array_delimiter: the delimiter of array elements
+    :rtype: a list of strings
+    """
+    return [get_value(properties.get(k), encoder,
+                      array_delimiter if t and t.endswith('[]') else None)
+            for k, t in columns]
+
+
+def write_csv(graph, nodes_file, edges_file, edge_rel_name=None, label=None,
+              encoder=None, edge_rel_key=None, delimiter=',',
+              array_delimiter=';'):
+    """Write the `graph` as a pair of CSV files in the format of the Neo4j
+    bulk importer (``neo4j-admin import``). The code below shows a simple
+    example::
+
+        from neonx.export import write_csv
+
+        with open('nodes.csv', 'w') as nodes_file:
+            with open('relationships.csv', 'w') as edges_file:
+                write_csv(G, nodes_file, edges_file, 'LINKS_TO', 'Node')
+
+    The nodes and edges are streamed to the files. They are read twice,
+    once to collect the property names and types for the header and once
+    to write the rows.
+
+    The header gives the type of each property whose values share one
+    (e.g. ``weight:double``, ``since:long``, ``flag:boolean`` or
+    ``tags:string[]``), so the importer does not load them as strings.
+    Arrays are written with their elements joined by `array_delimiter`,
+    which must match ``--array-delimiter`` of the importer and must not
+    appear in the elements. Properties with mixed or nested values are
+    written as JSON text.
+
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
+    :param nodes_file: A file object the nodes are written to.
+    :param edges_file: A file object the relationships are written to.
+    :param optional edge_rel_name: Relationship name between the nodes.
+    :param optional label: Label added to all nodes.
+    :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :param optional delimiter: The field delimiter.
+    :param optional array_delimiter: The delimiter of array elements.
+    """
+    if encoder is None:
+        encoder = json.JSONEncoder()
+
+    if edge_rel_name is None and edge_rel_key is None:
+        raise ValueError(
+            'Must provide either `edge_rel_name` or `edge_rel_key`')
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+
+    columns = get_columns(iter_converted(source.nodes(), encoder))
+    writer = csv.writer(nodes_file, delimiter=delimiter)
+    writer.writerow([':ID'] + get_header(columns) +
+                    ([':LABEL'] if label else []))
+    for node_name, properties in iter_converted(source.nodes(), encoder):
+        row = [node_name] + get_row(properties, columns, encoder,
+                                    array_delimiter)
+        if label:
+            row.append(label)
+        writer.writerow(row)
+
+    columns = get_columns(iter_converted(source.edges(), encoder))
+    writer = csv.writer(edges_file, delimiter=delimiter)
+    writer.writerow([':START_ID', ':END_ID', ':TYPE'] + get_header(columns))
+    for from_node, to_node, properties in iter_converted(source.edges(),
+                                                         encoder):
+        ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+        values = get_row(properties, columns, encoder, array_delimiter)
+        writer.writerow([from_node, to_node, ename] + values)
+        if not is_digraph:
+            writer.writerow([to_node, from_node, ename] + values)
+
+
+def encode_block(operations, encoder, first):
+    """encodes a block of batch operations as lines of a JSON array.
+
+    :param operations: a list of dictionaries representing Neo4j requests
+    :param encoder: a JSONEncoder object
+    :param first: whether the block starts the array
+    :rtype: the UTF-8 encoded lines
+    """
+    lines = []
+    for operation in operations:
+        lines.append(('[' if first else ',') + encoder.encode(operation))
+        first = False
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class ShardWriter(object):
+    """writes one shard of `write_shards()`, a JSON array of batch
+    operations, into a gzip compressed file. The operations are encoded,
+    compressed and written by a thread of its own, so the shards are
+    written in parallel. Given a `multiprocessing.Pool`, the operations
+    are encoded in its processes instead.
+
+    :param path: the path of the file
+    :param encoder: a JSONEncoder object
+    :param optional pool: a `multiprocessing.Pool` encoding the operations
+    :param optional queue_size: the maximum number of blocks of operations
+        waiting to be written
+    """
+
+    def __init__(self, path, encoder, pool=None, queue_size=4):
+        self.encoder = encoder
+        self.pool = pool
+        self.operations = []
+        self.count = 0
+        self.errors = []
+        self.file = gzip.open(path, 'wb')
+        self.queue = queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            block = self.queue.get()
+            if block is None:
+                return
+            if not self.errors:
+                try:
+                    if isinstance(block, tuple):
+                        block = encode_block(block[0], self.encoder,
+                                             block[1])
+                    elif not isinstance(block, bytes):
+                        block = block.get()
+                    self.file.write(block)
+                except Exception as e:
+                    self.errors.append(e)
+
+    def write(self, operation):
+        """adds a batch operation to the shard.
+
+        :param operation: a dictionary representing a Neo4j request
+        """
+        self.operations.append(operation)
+        if len(self.operations) >= BLOCK_LINES:
+            self.flush()
+
+    def flush(self):
+        """hands the buffered operations to the writing thread."""
+        if self.operations:
+            block = (self.operations, self.count == 0)
+            if self.pool is not None:
+                block = self.pool.apply_async(encode_block,
+                                              (block[0], self.encoder,
+                                               block[1]))
+            self.queue.put(block)
+            self.count += len(self.operations)
+            self.operations = []
+
+    def close(self):
+        """writes the remaining operations and closes the file."""
+        self.flush()
+        self.queue.put(b']\n' if self.count else b'[]\n')
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.errors:
+            raise self.errors[0]
+
+
+def write_shards(graph, paths, edge_rel_name=None, label=None, encoder=None,
+                 edge_rel_key=None, batch_size=1000, id_key='_neonx_id',
+                 processes=0):
+    """Write the `graph` into gzip compressed files of batch operations for
+    the batch endpoint of the Neo4j server (like `write_to_neo`), each of
+    which can be loaded on its own::
+
+        from neonx.export import write_shards
+
+        write_shards(G, ['shard-{0}.json.gz'.format(i) for i in range(4)],
+                     edge_rel_name='LINKS_TO', edge_rel_key='type',
+                     label='Node')
+
+    The nodes and the relationships are written in Cypher queries of at
+    most `batch_size` rows, which are spread over the files in `paths` in
+    turn. The nodes are merged by the `label` and the property `id_key`
+    holding the node name, and their properties are set. The relationships
+    merge their nodes the same way before merging themselves. So the files
+    can be loaded in any order or concurrently, and loading a file twice
+    does not duplicate anything. Create a uniqueness constraint first, e.g.
+    ``CREATE CONSTRAINT ON (n:Node) ASSERT n._neonx_id IS UNIQUE``: it is
+    the index the merges look up, and keeps concurrent loads from creating
+    a node twice.
+
+    Geoff is not offered as a format, since it can only refer to the nodes
+    of the same file and cannot merge them.
+
+    Each file is encoded and compressed in a thread of its own. As encoding
+    JSON needs the global interpreter lock, pass `processes` to encode in
+    as many processes; the `encoder` must then be picklable.
+
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
+    :param paths: A list of paths of the files.
+    :param optional edge_rel_name: Relationship name between the nodes.
+    :param label: Label added to all nodes.
+    :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :param optional batch_size: Maximum number of rows per query.
+    :param optional id_key: The node property holding the node name.
+    :param optional processes: The number of processes encoding the
+        operations. Defaults to encoding in the threads of the files.
+    :rtype: A dictionary with the number of written 'nodes' and
+        'relationships'.
+    """
+    if encoder is None:
+        encoder = json.JSONEncoder()
+
+    if edge_rel_name is None and edge_rel_key is None:
+        raise ValueError(
+            'Must provide either `edge_rel_name` or `edge_rel_key`')
+    if not label:
+        raise ValueError('Must provide a `label` to find the nodes by')
+    if not paths:
+        raise ValueError('At least one path is needed')
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+    counts = {'nodes': 0, 'relationships': 0}
+    quoted_label = ':' + neo.quote_name(label)
+    quoted_key = neo.quote_name(id_key)
+
+    pool = multiprocessing.Pool(processes) if processes else None
+    shards = []
+    try:
+        for path in paths:
+            shards.append(ShardWriter(path, encoder, pool))
+        written = [0]
+
+        def write(query, rows):
+            shard = shards[written[0] % len(shards)]
+            shard.write(neo.get_cypher(query, {'rows': rows}))
+            written[0] += 1
+
+        query = SHARD_NODE_QRY.format(quoted_label, quoted_key)
+        nodes = iter_converted(source.nodes(), encoder)
+        for chunk in chunks(nodes, batch_size):
+            write(query, [{'id': node_name, 'properties': properties}
+                          for node_name, properties in chunk])
+            counts['nodes'] += len(chunk)
+
+        pending = {}
+
+        def flush(ename):
+            write(SHARD_REL_QRY.format(quoted_label, quoted_key,
+                                       neo.quote_name(ename)),
+                  pending.pop(ename))
+
+        for from_node, to_node, properties in iter_converted(source.edges(),
+                                                             encoder):
+            ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+            ends = [(from_node, to_node)]
+            if not is_digraph:
+                ends.append((to_node, from_node))
+            for start, end in ends:
+                rows = pending.setdefault(ename, [])
+                rows.append({'start': start, 'end': end,
+                             'properties': properties})
+                counts['relationships'] += 1
+                if len(rows) >= batch_size:
+                    flush(ename)
+        for ename in sorted(pending):
+            flush(ename)
+    finally:
+        errors = []
+        for shard in shards:
+            try:
+                shard.close()
+            except Exception as e:
+                errors.append(e)
+        # after the shards, which wait for the blocks encoded by the pool
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if errors:
+        raise errors[0]
+    return counts
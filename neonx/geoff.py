@@ -3,7 +3,9 @@
 
 import json
 
-import networkx as nx
+from .encoders import iter_converted
+from .neo import get_rel_name
+from .source import as_source
 
 
 __all__ = ['get_geoff']
@@ -49,7 +51,7 @@ def get_edge(from_node, to_node, properties, edge_relationship_name, encoder):
     return edge_string
 
 
-def get_geoff(graph, edge_rel_name, encoder=None):
+def get_geoff(graph, edge_rel_name=None, encoder=None, edge_rel_key=None):
     """ Get the `graph` as Geoff string. The edges between the nodes
     have relationship name `edge_rel_name`. The code
     below shows a simple example::
@@ -71,25 +73,36 @@ def get_geoff(graph, edge_rel_name, encoder=None):
     class. See `JSONEncoder
     <http://docs.python.org/2/library/json.html#json.JSONEncoder/>`_.
 
-    :param graph: A NetworkX Graph or a DiGraph
-    :param edge_rel_name: Relationship name between the nodes
+    As in `write_to_neo`, the relationship name can be taken from the edge
+    attribute `edge_rel_key`, falling back to `edge_rel_name`.
+
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`
+    :param optional edge_rel_name: Relationship name between the nodes
     :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
     :rtype: A Geoff string
     """
 
     if encoder is None:
         encoder = json.JSONEncoder()
-    is_digraph = isinstance(graph, nx.DiGraph)
+
+    if edge_rel_name is None and edge_rel_key is None:
+        raise ValueError(
+            'Must provide either `edge_rel_name` or `edge_rel_key`')
+    source = as_source(graph)
+    is_digraph = source.is_directed()
 
     lines = []
     lapp = lines.append
-    for node_name, properties in graph.nodes(data=True):
+    for node_name, properties in iter_converted(source.nodes(), encoder):
         lapp(get_node(node_name, properties, encoder))
 
-    for from_node, to_node, properties in graph.edges(data=True):
-        lapp(get_edge(from_node, to_node, properties, edge_rel_name, encoder))
+    for from_node, to_node, properties in iter_converted(source.edges(),
+                                                         encoder):
+        ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+        lapp(get_edge(from_node, to_node, properties, ename, encoder))
         if not is_digraph:
-            lapp(get_edge(to_node, from_node, properties, edge_rel_name,
-                          encoder))
+            lapp(get_edge(to_node, from_node, properties, ename, encoder))
 
     return '\n'.join(lines)
@@ -1,16 +1,26 @@
 
 # -*- coding: utf-8 -*-
 
+import codecs
 import json
+from array import array
+from collections import deque, namedtuple
+from operator import itemgetter
 
-import networkx as nx
-import requests
+from .encoders import iter_converted
+from .profiling import NO_PROFILER
+from .source import as_source, chunks
 
-__all__ = ['write_to_neo', 'get_neo_graph']
+__all__ = ['write_to_neo', 'get_neo_graph', 'get_neo_subgraph', 'clear_label',
+           'replace_label']
 
 
 JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
 HEADERS = {'content-type': JSON_CONTENT_TYPE}
+STREAM_HEADERS = {'content-type': JSON_CONTENT_TYPE, 'X-Stream': 'true'}
+CHUNK_BYTES = 64 * 1024
+
+RESPONSE_MODES = ('full', 'ids', 'counts')
 
 
 def get_node(node_id, properties):
@@ -56,8 +66,47 @@ def get_label(i, label):
             "body": label}
 
 
+def get_node_relationship(from_id, to_id, rel_name, properties):
+    """reformats a NetworkX edge between two existing Neo4j nodes.
+
+    :param from_id: the Neo4j ID of the source node
+    :param to_id: the Neo4j ID of the target node
+    :param rel_name: string that describes the relationship between the
+        two nodes
+    :param properties: a dictionary of edge attributes
+    :rtype: a dictionary representing a Neo4j POST request
+    """
+    body = {"to": "/node/{0}".format(to_id), "type": rel_name,
+            "data": properties}
+
+    return {"method": "POST",
+            "to": "/node/{0}/relationships".format(from_id),
+            "body": body}
+
+
+def get_rel_name(properties, edge_rel_name=None, edge_rel_key=None):
+    """returns the relationship name of an edge.
+
+    :param properties: a dictionary of edge attributes
+    :param optional edge_rel_name: the default relationship name
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :rtype: a string
+    """
+    if edge_rel_key is not None:
+        try:    # If `edge_rel_key` is not in this edge's properties...
+            return properties[edge_rel_key]
+        except KeyError:
+            # ...attempt to default to `edge_rel_name` before complaining.
+            if edge_rel_name is not None:
+                return edge_rel_name
+            else:   # If neither are provided, raise a ValueError.
+                raise ValueError('Invalid edge label key')
+    else:   # Use edge_rel_name if edge_rel_key is not provided.
+        return edge_rel_name
+
+
 def generate_data(graph, edge_rel_name=None, label=None, encoder=None,
-                  edge_rel_key=None):
+                  edge_rel_key=None, profiler=NO_PROFILER):
     """converts a NetworkX graph into a format that can be uploaded to
     Neo4j using a single HTTP POST request.
 
@@ -66,23 +115,36 @@ def generate_data(graph, edge_rel_name=None, label=None, encoder=None,
     :rtype: a JSON encoded string for `Neo4j batch operations \
     <http://docs.neo4j.org/chunked/stable/rest-api-batch-ops.html>_`.
 
-    :param graph: A NetworkX Graph or a DiGraph
+    :param graph: A NetworkX Graph or a DiGraph or a `GraphSource`
     :param optional edge_rel_name: string that describes the relationship
         between the two nodes
     :param label: an optional label to be added to all nodes
     :param encoder: a JSONEncoder object
     :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :param optional profiler: a `neonx.profiling.Profiler`
     """
 
     if edge_rel_name is None and edge_rel_key is None:
         raise ValueError(
             'Must provide either `edge_rel_name` or `edge_rel_key`')
 
-    is_digraph = isinstance(graph, nx.DiGraph)
+    with profiler.phase('build'):
+        entities = get_entities(graph, edge_rel_name, label, encoder,
+                                edge_rel_key)
+    with profiler.phase('encode'):
+        return encoder.encode(entities)
+
+
+def get_entities(graph, edge_rel_name, label, encoder, edge_rel_key):
+    """converts a NetworkX graph into a list of batch operations, see
+    `generate_data()`."""
+    source = as_source(graph)
+    is_digraph = source.is_directed()
     entities = []
     nodes = {}
 
-    for i, (node_name, properties) in enumerate(graph.nodes(data=True)):
+    for i, (node_name, properties) in enumerate(
+            iter_converted(source.nodes(), encoder)):
         entities.append(get_node(i, properties))
         nodes[node_name] = i
 
@@ -90,18 +152,9 @@ def generate_data(graph, edge_rel_name=None, label=None, encoder=None,
         for i in nodes.values():
             entities.append(get_label(i, label))
 
-    for from_node, to_node, properties in graph.edges(data=True):
-        if edge_rel_key is not None:
-            try:    # If `edge_rel_key` is not in this edge's properties...
-                ename = properties[edge_rel_key]
-            except KeyError:
-                # ...attempt to default to `edge_rel_name` before complaining.
-                if edge_rel_name is not None:
-                    ename = edge_rel_name
-                else:   # If neither are provided, raise a ValueError.
-                    raise ValueError('Invalid edge label key')
-        else:   # Use edge_rel_name if edge_rel_key is not provided.
-            ename = edge_rel_name
+    for from_node, to_node, properties in iter_converted(source.edges(),
+                                                         encoder):
+        ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
 
         edge = get_relationship(nodes[from_node], nodes[to_node], ename,
                                 properties)
@@ -113,7 +166,7 @@ def generate_data(graph, edge_rel_name=None, label=None, encoder=None,
                                             ename, properties)
             entities.append(reverse_edge)
 
-    return encoder.encode(entities)
+    return entities
 
 
 def check_exception(result):
@@ -147,14 +200,558 @@ def get_server_urls(server_url, user, password):
     :param password: The password belonging to the given Neo4j user name.
     :rtype: a dictionary of parameters of the Neo4j server
     """
+    import requests
+
     result = requests.get(server_url, auth=(user, password))
     check_exception(result)
 
     return result.json()
 
 
+def iter_json_array(chunks):
+    """parses a JSON array incrementally and yields its elements one by one,
+    so the whole array is never held in memory.
+
+    :param chunks: an iterable of byte strings that form a JSON array
+    :rtype: a generator of the decoded elements
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    started = False
+    done = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if not started and pos < len(buf):
+            if buf[pos] != '[':
+                raise ValueError('Expected a JSON array')
+            started = True
+            pos += 1
+            continue
+        if started and pos < len(buf) and buf[pos] == ']':
+            return
+
+        if pos < len(buf):
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                end = None
+            # an element is complete once it is followed by a delimiter, as a
+            # number may continue in the next chunk
+            if end is not None and (done or (end < len(buf) and
+                                             buf[end] in ' \t\r\n,]')):
+                yield item
+                pos = end
+                continue
+            if done:
+                raise ValueError('Invalid JSON array')
+
+        if done:
+            raise ValueError('Unexpected end of JSON array')
+        try:
+            buf = buf[pos:] + text_decoder.decode(next(chunks))
+        except StopIteration:
+            buf = buf[pos:] + text_decoder.decode(b'', final=True)
+            done = True
+        pos = 0
+
+
+def post_batch(batch_url, data, user, password, compact=False,
+               profiler=NO_PROFILER):
+    """sends batch operations to the Neo4j server.
+
+    If `compact` is set, the server is asked to stream its answer, which is
+    parsed one result at a time. Only the 'id' and 'location' of each result
+    are kept.
+
+    :param batch_url: URL of the batch endpoint of the Neo4j server.
+    :param data: a JSON encoded string of batch operations
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :param optional compact: True, to only keep IDs and locations.
+    :param optional profiler: a `neonx.profiling.Profiler`
+    :rtype: A list of Neo4j created resources.
+    """
+    import requests
+
+    if not compact:
+        with profiler.phase('request'):
+            result = requests.post(batch_url, data=data, headers=HEADERS,
+                                   auth=(user, password))
+            check_exception(result)
+        with profiler.phase('parse'):
+            return result.json()
+
+    with profiler.phase('request'):
+        result = requests.post(batch_url, data=data, headers=STREAM_HEADERS,
+                               auth=(user, password), stream=True)
+    try:
+        check_exception(result)
+        # the answer is downloaded while it is parsed
+        with profiler.phase('parse'):
+            return [dict((k, r[k]) for k in ('id', 'location') if k in r)
+                    for r in iter_json_array(
+                        result.iter_content(CHUNK_BYTES))]
+    finally:
+        result.close()
+
+
+class ResultCollector(object):
+    """collects the batch results of an upload in the form selected by
+    `response`:
+
+    * 'full': the list of all Neo4j created resources
+    * 'ids': an array of the Neo4j IDs of the created nodes, in the order in
+      which the nodes were uploaded
+    * 'counts': a dictionary with the number of created 'nodes' and
+      'relationships'
+    """
+
+    def __init__(self, response='full'):
+        if response not in RESPONSE_MODES:
+            raise ValueError('`response` must be one of {0}'.format(
+                ', '.join(RESPONSE_MODES)))
+        self.response = response
+        self.results = []
+        self.ids = array(ID_TYPECODE)
+        self.counts = {'nodes': 0, 'relationships': 0}
+
+    @property
+    def compact(self):
+        """True, if only IDs and locations are needed."""
+        return self.response != 'full'
+
+    def add(self, results):
+        """adds the results of a batch request."""
+        if self.response == 'full':
+            self.results.extend(results)
+        elif self.response == 'ids':
+            created = get_created_ids(results)
+            self.ids.extend(created[i] for i in sorted(created))
+        else:
+            for r in results:
+                kind = r.get('location', '').rpartition('/')[0]
+                if kind.endswith('/node'):
+                    self.counts['nodes'] += 1
+                elif kind.endswith('/relationship'):
+                    self.counts['relationships'] += 1
+
+    def add_merged(self, results, node_ids=(), relationships=0):
+        """adds the results of an upsert request, see `merge_chunks()`.
+
+        :param results: the batch results
+        :param optional node_ids: the Neo4j IDs of all nodes of the chunk,
+            whether they existed or were created
+        :param optional relationships: the number of merged relationships
+        """
+        if self.response == 'full':
+            self.results.extend(results)
+        elif self.response == 'ids':
+            self.ids.extend(node_ids)
+        else:
+            self.counts['nodes'] += len(get_created_ids(results))
+            self.counts['relationships'] += relationships
+
+    def get(self):
+        """returns the collected results."""
+        if self.response == 'full':
+            return self.results
+        if self.response == 'ids':
+            return self.ids
+        return self.counts
+
+
+def generate_node_chunk(nodes, label, encoder, profiler=NO_PROFILER):
+    """converts a chunk of nodes into batch operations. The nodes get the
+    batch IDs 0 to ``len(nodes) - 1``.
+
+    :param nodes: a list of (node name, properties) tuples
+    :param label: an optional label to be added to all nodes
+    :param encoder: a JSONEncoder object
+    :param optional profiler: a `neonx.profiling.Profiler`
+    :rtype: a JSON encoded string of batch operations
+    """
+    with profiler.phase('build'):
+        entities = [get_node(i, properties)
+                    for i, (_, properties) in enumerate(
+                        iter_converted(nodes, encoder))]
+        if label:
+            entities.extend(get_label(i, label) for i in range(len(nodes)))
+    with profiler.phase('encode'):
+        return encoder.encode(entities)
+
+
+def generate_edge_chunk(edges, node_ids, edge_rel_name, edge_rel_key,
+                        is_digraph, encoder, profiler=NO_PROFILER):
+    """converts a chunk of edges between existing Neo4j nodes into batch
+    operations.
+
+    :param edges: a list of (from node, to node, properties) tuples
+    :param node_ids: a dictionary mapping node names to Neo4j node IDs, or
+        None if the edges already refer to Neo4j node IDs
+    :param edge_rel_name: string that describes the relationship
+    :param edge_rel_key: Key in edge attributes to use as edge label.
+    :param is_digraph: False, if each edge is created in both directions
+    :param encoder: a JSONEncoder object
+    :param optional profiler: a `neonx.profiling.Profiler`
+    :rtype: a JSON encoded string of batch operations
+    """
+    with profiler.phase('build'):
+        entities = []
+        eapp = entities.append
+        for from_node, to_node, properties in iter_converted(edges, encoder):
+            ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+            if node_ids is None:
+                from_id, to_id = from_node, to_node
+            else:
+                from_id, to_id = node_ids[from_node], node_ids[to_node]
+            eapp(get_node_relationship(from_id, to_id, ename, properties))
+            if not is_digraph:
+                eapp(get_node_relationship(to_id, from_id, ename, properties))
+    with profiler.phase('encode'):
+        return encoder.encode(entities)
+
+
+def get_created_ids(results):
+    """extracts the Neo4j IDs of the nodes created by a chunk from the
+    batch results.
+
+    :param results: the batch results of `generate_node_chunk()`
+    :rtype: a dictionary mapping batch IDs to Neo4j node IDs
+    """
+    return dict((r['id'], int(r['location'].rpartition('/')[-1]))
+                for r in results if r.get('location') and 'id' in r and
+                r['location'].rpartition('/')[0].endswith('/node'))
+
+
+def imap_bounded(pool, func, items, size):
+    """applies `func` to the `items` in the `pool` like ``pool.imap``, but
+    reads the next item only while fewer than `size` are being processed.
+    So a streamed graph is never read far ahead of the requests.
+
+    :param pool: a `multiprocessing.pool.ThreadPool`
+    :param func: a function of one item
+    :param items: an iterable of items
+    :param size: the maximum number of items processed at the same time
+    :rtype: an iterator of the results, in the order of the items
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item, )))
+        if len(pending) >= size:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def get_edge_rounds(edges, chunk_size, partition_edges=False,
+                    hub_degree=None):
+    """splits the edges into rounds of batches of at most `chunk_size`
+    edges. A round has to be finished before the next one starts.
+
+    :param edges: an iterable of (from node, to node, properties) tuples
+    :param chunk_size: the maximum number of edges per batch
+    :param partition_edges: True, for rounds of batches with disjoint
+        nodes, see `neonx.schedule.schedule_edges`. Otherwise, all batches
+        form a single round.
+    :param hub_degree: the degree from which on a node is a hub, see
+        `neonx.schedule.schedule_edges`
+    :rtype: an iterable of rounds, each an iterable of lists of edges
+    """
+    if partition_edges:
+        from .schedule import schedule_edges
+
+        return schedule_edges(edges, chunk_size, hub_degree)
+    return [chunks(edges, chunk_size)]
+
+
+def write_chunks(batch_url, graph, user, password, edge_rel_name=None,
+                 label=None, encoder=None, edge_rel_key=None,
+                 chunk_size=10000, workers=1, progress=None,
+                 response='full', partition_edges=False, hub_degree=None,
+                 profiler=NO_PROFILER):
+    """uploads the `graph` in batch requests of at most `chunk_size` nodes
+    or edges. All nodes are created before the first relationship.
+
+    :param batch_url: URL of the batch endpoint of the Neo4j server.
+    :param progress: an optional function that is called with 'nodes' or
+        'relationships' and the number of nodes or edges after each request
+    :param response: the form of the results, see `ResultCollector`
+    :param partition_edges: True, to send the edges in rounds of batches
+        with disjoint nodes, see `neonx.schedule.schedule_edges`
+    :param hub_degree: the degree from which on a node is a hub, see
+        `neonx.schedule.schedule_edges`
+    :param profiler: a `neonx.profiling.Profiler`
+    :rtype: The results selected by `response`.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+    results = ResultCollector(response)
+    pool = ThreadPool(workers)
+    node_ids = {}
+
+    def send_nodes(chunk):
+        data = generate_node_chunk(chunk, label, encoder, profiler)
+        return chunk, post_batch(batch_url, data, user, password,
+                                 compact=results.compact, profiler=profiler)
+
+    def send_edges(chunk):
+        data = generate_edge_chunk(chunk, node_ids, edge_rel_name,
+                                   edge_rel_key, is_digraph, encoder,
+                                   profiler)
+        return chunk, post_batch(batch_url, data, user, password,
+                                 compact=results.compact, profiler=profiler)
+
+    try:
+        for chunk, result in imap_bounded(pool, send_nodes,
+                                          chunks(source.nodes(), chunk_size),
+                                          workers):
+            for i, node_id in get_created_ids(result).items():
+                node_ids[chunk[i][0]] = node_id
+            results.add(result)
+            if progress is not None:
+                progress('nodes', len(chunk))
+
+        for batches in get_edge_rounds(source.edges(), chunk_size,
+                                       partition_edges, hub_degree):
+            for chunk, result in imap_bounded(pool, send_edges, batches,
+                                              workers):
+                results.add(result)
+                if progress is not None:
+                    progress('relationships', len(chunk))
+    except BaseException:
+        # don't send the chunks that are waiting after a failed one
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+    return results.get()
+
+
+MERGE_LOOKUP_QRY = """MATCH (n{0}) WHERE n.{1} IN {{keys}} \
+RETURN n.{1}, ID(n);"""
+MERGE_UPDATE_QRY = """UNWIND {rows} AS row MATCH (n) WHERE ID(n) = row.id \
+SET n += row.properties;"""
+MERGE_REL_QRY = """UNWIND {{rows}} AS row MATCH (a), (b) \
+WHERE ID(a) = row.from AND ID(b) = row.to \
+MERGE (a)-[r:{0}]->(b) SET r += row.properties;"""
+
+
+def get_cypher(query, params):
+    """returns a batch operation that runs a Cypher query.
+
+    :param query: the Cypher query
+    :param params: a dictionary of query parameters
+    :rtype: a dictionary representing a Neo4j POST request
+    """
+    return {"method": "POST",
+            "to": "/cypher",
+            "body": {"query": query, "params": params}}
+
+
+def get_merge_keys(nodes, merge_key):
+    """returns the values of the `merge_key` property of the nodes.
+
+    :param nodes: a list of (node name, properties) tuples
+    :param merge_key: the name of the property that identifies a node
+    :rtype: a list of property values
+    """
+    try:
+        return [properties[merge_key] for _, properties in nodes]
+    except KeyError:
+        raise ValueError('All nodes must have the `merge_key` property')
+
+
+def generate_lookup_chunk(keys, label, merge_key, encoder):
+    """converts the keys of a chunk of nodes into a single batch operation
+    that finds the existing Neo4j nodes with these keys.
+
+    :param keys: a list of `merge_key` values
+    :param label: an optional label of the nodes
+    :param merge_key: the name of the property that identifies a node
+    :param encoder: a JSONEncoder object
+    :rtype: a JSON encoded string of batch operations
+    """
+    label = ':' + quote_name(label) if label else ''
+    query = MERGE_LOOKUP_QRY.format(label, quote_name(merge_key))
+    return encoder.encode([get_cypher(query, {"keys": keys})])
+
+
+def generate_merge_node_chunk(nodes, keys, existing, label, encoder,
+                              profiler=NO_PROFILER):
+    """converts a chunk of nodes into batch operations that create the
+    missing nodes and update the properties of the existing ones. The
+    created nodes get the batch IDs 0 to ``len(created) - 1``.
+
+    :param nodes: a list of (node name, properties) tuples
+    :param keys: the `merge_key` values of the nodes
+    :param existing: a dictionary mapping keys to Neo4j node IDs
+    :param label: an optional label to be added to the created nodes
+    :param encoder: a JSONEncoder object
+    :param optional profiler: a `neonx.profiling.Profiler`
+    :rtype: a tuple of the JSON encoded batch operations and a list of the
+        keys of the created nodes
+    """
+    with profiler.phase('build'):
+        entities = []
+        created = []
+        updates = []
+        seen = set()
+        for key, (_, properties) in zip(keys, nodes):
+            if key in existing:
+                updates.append({"id": existing[key], "properties": properties})
+            elif key not in seen:
+                seen.add(key)
+                entities.append(get_node(len(created), properties))
+                created.append(key)
+        if label:
+            entities.extend(get_label(i, label) for i in range(len(created)))
+        if updates:
+            entities.append(get_cypher(MERGE_UPDATE_QRY, {"rows": updates}))
+    with profiler.phase('encode'):
+        return encoder.encode(entities), created
+
+
+def generate_merge_edge_chunk(edges, node_ids, edge_rel_name, edge_rel_key,
+                              is_digraph, encoder, profiler=NO_PROFILER):
+    """converts a chunk of edges between existing Neo4j nodes into one
+    Cypher MERGE operation per relationship name, so that existing
+    relationships are updated instead of duplicated.
+
+    :param edges: a list of (from node, to node, properties) tuples
+    :param node_ids: a dictionary mapping node names to Neo4j node IDs
+    :param edge_rel_name: string that describes the relationship
+    :param edge_rel_key: Key in edge attributes to use as edge label.
+    :param is_digraph: False, if each edge is merged in both directions
+    :param encoder: a JSONEncoder object
+    :param optional profiler: a `neonx.profiling.Profiler`
+    :rtype: a tuple of the JSON encoded batch operations and the number of
+        merged relationships
+    """
+    with profiler.phase('build'):
+        rows = {}
+        count = 0
+        for from_node, to_node, properties in iter_converted(edges, encoder):
+            ename = get_rel_name(properties, edge_rel_name, edge_rel_key)
+            from_id, to_id = node_ids[from_node], node_ids[to_node]
+            rapp = rows.setdefault(ename, []).append
+            rapp({"from": from_id, "to": to_id, "properties": properties})
+            count += 1
+            if not is_digraph:
+                rapp({"from": to_id, "to": from_id, "properties": properties})
+                count += 1
+        entities = [get_cypher(MERGE_REL_QRY.format(quote_name(ename)),
+                               {"rows": rows[ename]})
+                    for ename in sorted(rows)]
+    with profiler.phase('encode'):
+        return encoder.encode(entities), count
+
+
+def merge_chunks(batch_url, graph, user, password, merge_key,
+                 edge_rel_name=None, label=None, encoder=None,
+                 edge_rel_key=None, chunk_size=10000, workers=1,
+                 progress=None, response='full', partition_edges=False,
+                 hub_degree=None, profiler=NO_PROFILER):
+    """uploads the `graph` like `write_chunks()`, but reuses the Neo4j
+    nodes whose `merge_key` property matches the one of a node. Each chunk
+    of nodes takes two requests: one Cypher query looks up all keys of the
+    chunk, the other creates the missing nodes and updates the properties
+    of the existing ones. Relationships are merged with Cypher, one query
+    per relationship name and chunk.
+
+    The chunks of nodes are sent one after another, regardless of
+    `workers`: concurrent chunks would look up their keys before the other
+    chunk has created them and create a node with the same key twice.
+    Only the relationships are sent concurrently.
+
+    :param batch_url: URL of the batch endpoint of the Neo4j server.
+    :param merge_key: the name of the node property that identifies a node
+    :param response: the form of the results, see `ResultCollector`. For
+        'ids', the array holds the IDs of both existing and created nodes;
+        for 'counts', 'relationships' is the number of merged relationships.
+    :param profiler: a `neonx.profiling.Profiler`
+    :rtype: The results selected by `response`.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+    results = ResultCollector(response)
+    pool = ThreadPool(workers)
+    node_ids = {}
+
+    def send_nodes(chunk):
+        with profiler.phase('build'):
+            chunk = list(iter_converted(chunk, encoder))
+            keys = get_merge_keys(chunk, merge_key)
+        data = generate_lookup_chunk(keys, label, merge_key, encoder)
+        result = post_batch(batch_url, data, user, password,
+                            profiler=profiler)
+        existing = {}
+        for key, node_id in result[0]['body']['data']:
+            existing.setdefault(key, node_id)
+
+        data, created = generate_merge_node_chunk(chunk, keys, existing,
+                                                  label, encoder, profiler)
+        result = post_batch(batch_url, data, user, password,
+                            compact=results.compact, profiler=profiler)
+        for i, node_id in get_created_ids(result).items():
+            existing[created[i]] = node_id
+        return chunk, [existing[key] for key in keys], result
+
+    def send_edges(chunk):
+        data, count = generate_merge_edge_chunk(chunk, node_ids,
+                                                edge_rel_name, edge_rel_key,
+                                                is_digraph, encoder, profiler)
+        return chunk, count, post_batch(batch_url, data, user, password,
+                                        compact=results.compact,
+                                        profiler=profiler)
+
+    try:
+        # a key may be in several chunks, each must see the nodes created by
+        # the chunks before
+        for chunk, ids, result in (
+                send_nodes(chunk)
+                for chunk in chunks(source.nodes(), chunk_size)):
+            for (node, _), node_id in zip(chunk, ids):
+                node_ids[node] = node_id
+            results.add_merged(result, node_ids=ids)
+            if progress is not None:
+                progress('nodes', len(chunk))
+
+        for batches in get_edge_rounds(source.edges(), chunk_size,
+                                       partition_edges, hub_degree):
+            for chunk, count, result in imap_bounded(pool, send_edges,
+                                                     batches, workers):
+                results.add_merged(result, relationships=count)
+                if progress is not None:
+                    progress('relationships', len(chunk))
+    except BaseException:
+        # don't send the chunks that are waiting after a failed one
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+    return results.get()
+
+
 def write_to_neo(server_url, graph, user, password, edge_rel_name=None,
-                 label=None, encoder=None, edge_rel_key=None):
+                 label=None, encoder=None, edge_rel_key=None,
+                 chunk_size=None, workers=1, progress=None, response='full',
+                 partition_edges=False, hub_degree=None, merge_key=None,
+                 profiler=None):
     """Write the `graph` as Geoff string. The edges between the nodes
     have relationship name `edge_rel_name`. The code
     below shows a simple example::
@@ -197,8 +794,43 @@ def write_to_neo(server_url, graph, user, password, edge_rel_name=None,
         results = write_to_neo("http://localhost:7474/db/data/", G, \
 'LINKS_TO', 'Node', edge_rel_key='label')
 
+    Large graphs can be uploaded in several requests of at most `chunk_size`
+    nodes or edges, of which `workers` are sent concurrently. The graph is
+    only read as far as the chunks being sent. All nodes are created before
+    the first relationship, so only the mapping from node names to Neo4j
+    IDs is kept in memory. If a request fails, no further chunks are sent.
+
+    The server echoes every created node and relationship, which is often
+    more data than the upload itself. With ``response='ids'`` or
+    ``response='counts'``, the answer is streamed and parsed one result at a
+    time, and only the Neo4j node IDs or the numbers of created nodes and
+    relationships are returned.
+
+    Concurrent requests that create relationships of the same nodes compete
+    for the locks of these nodes and may deadlock. With `partition_edges`,
+    the edges are sent in rounds of batches that touch disjoint sets of
+    nodes; the edges of nodes with at least `hub_degree` edges are batched
+    separately (see `neonx.schedule.schedule_edges`).
+
+    By default, every upload creates new nodes and relationships. With a
+    `merge_key`, nodes whose property `merge_key` matches an existing Neo4j
+    node (with the same `label`) are updated instead, and relationships are
+    merged, so repeated uploads are idempotent::
+
+        results = write_to_neo("http://localhost:7474/db/data/", G, \
+'neo4j', 'secret', 'LINKS_TO', label='Person', merge_key='email')
+
+    A `label` is required, as the existing nodes are looked up with one
+    Cypher query per chunk, which would scan all nodes of the database
+    without it. The lookup is fast if there is an index on `label` and
+    `merge_key`. Nodes with the same key end up as one Neo4j node, as long
+    as no other client creates nodes with this key at the same time. To
+    this end, the chunks of nodes are sent one after another; `workers`
+    only applies to the relationships.
+
     :param server_url: Server URL for the Neo4j server.
-    :param graph: A NetworkX Graph or a DiGraph.
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
     :param user: A Neo4j user name.
     :param password: The password belonging to the given Neo4j user name.
     :param optional edge_rel_name: Relationship name between the nodes.
@@ -206,67 +838,645 @@ def write_to_neo(server_url, graph, user, password, edge_rel_name=None,
 See `here <http://bit.ly/1fo5324>`_.
     :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
     :param optional edge_rel_key: Key in edge attributes to use as edge label.
-    :rtype: A list of Neo4j created resources.
+    :param optional chunk_size: Maximum number of nodes or edges per request.
+        Defaults to sending the whole graph in a single request.
+    :param optional workers: Number of requests sent concurrently, if
+        `chunk_size` is given. Defaults to 1.
+    :param optional progress: A function called with 'nodes' or
+        'relationships' and the number of nodes or edges after each request.
+    :param optional response: 'full' for the list of Neo4j created
+        resources, 'ids' for an array of the Neo4j IDs of the nodes (in the
+        order of `graph.nodes()`) or 'counts' for the number of created nodes
+        and relationships. Defaults to 'full'.
+    :param optional partition_edges: True, to avoid sending concurrent
+        requests for the same nodes, if `chunk_size` is given.
+    :param optional hub_degree: The degree from which on a node is treated
+        as a hub. Defaults to `chunk_size`.
+    :param optional merge_key: Node property that identifies a node, to
+        update existing nodes instead of creating duplicates. Needs a
+        `label`. `chunk_size` then defaults to 10000.
+    :param optional profiler: A `neonx.profiling.Profiler` that measures
+        the time and memory of each phase of the upload.
+    :rtype: A list of Neo4j created resources, an array or a dictionary.
     """
 
     if encoder is None:
         encoder = json.JSONEncoder()
+    if profiler is None:
+        profiler = NO_PROFILER
 
     if edge_rel_name is None and edge_rel_key is None:
         raise ValueError(
             'Must provide either `edge_rel_name` or `edge_rel_key`')
+    if merge_key is not None and not label:
+        raise ValueError('Must provide a `label` to look up the `merge_key`')
+
+    results = ResultCollector(response)
 
     all_server_urls = get_server_urls(server_url, user, password)
     batch_url = all_server_urls['batch']
 
+    if merge_key is not None:
+        return merge_chunks(batch_url, graph, user, password, merge_key,
+                            edge_rel_name=edge_rel_name, label=label,
+                            encoder=encoder, edge_rel_key=edge_rel_key,
+                            chunk_size=chunk_size or 10000, workers=workers,
+                            progress=progress, response=response,
+                            partition_edges=partition_edges,
+                            hub_degree=hub_degree, profiler=profiler)
+
+    if chunk_size is not None:
+        return write_chunks(batch_url, graph, user, password,
+                            edge_rel_name=edge_rel_name, label=label,
+                            encoder=encoder, edge_rel_key=edge_rel_key,
+                            chunk_size=chunk_size, workers=workers,
+                            progress=progress, response=response,
+                            partition_edges=partition_edges,
+                            hub_degree=hub_degree, profiler=profiler)
+
     data = generate_data(graph, edge_rel_name=edge_rel_name, label=label,
-                         encoder=encoder, edge_rel_key=edge_rel_key)
-    result = requests.post(batch_url, data=data, headers=HEADERS,
-                           auth=(user, password))
-    check_exception(result)
-    return result.json()
+                         encoder=encoder, edge_rel_key=edge_rel_key,
+                         profiler=profiler)
+    results.add(post_batch(batch_url, data, user, password,
+                           compact=results.compact, profiler=profiler))
+    return results.get()
+
+
+CLEAR_REL_QRY = """MATCH (n:{0})-[r]-() WITH DISTINCT r LIMIT {{limit}} \
+DELETE r RETURN count(r);"""
+CLEAR_NODE_QRY = """MATCH (n:{0}) WITH n LIMIT {{limit}} \
+DELETE n RETURN count(n);"""
+RELABEL_QRY = """MATCH (n:{0}) SET n:{1} REMOVE n:{0};"""
+
+
+def clear_label(server_url, label, user, password, batch_size=10000,
+                progress=None):
+    """Delete all nodes with a given label and their relationships::
+
+        from neonx import clear_label
+
+        counts = clear_label("http://localhost:7474/db/data/", 'Person',
+                             'neo4j', 'secret', batch_size=50000)
+
+    A single Cypher query deleting millions of nodes needs a transaction
+    holding all of them. Instead, the relationships and then the nodes are
+    deleted in transactions of at most `batch_size` each, until none are
+    left. If this is interrupted, calling it again deletes the rest.
+
+    :param server_url: Server URL for the Neo4j server.
+    :param label: The label of the nodes to delete.
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :param optional batch_size: Maximum number of nodes or relationships
+        deleted per transaction. Must be positive.
+    :param optional progress: A function called with 'relationships' or
+        'nodes' and the number of deleted ones after each transaction.
+    :rtype: A dictionary with the number of deleted 'nodes' and
+        'relationships'.
+    """
+    all_server_urls = get_server_urls(server_url, user, password)
+    batch_url = all_server_urls['batch']
+    return clear_batches(batch_url, label, user, password, batch_size,
+                         progress)
+
+
+def clear_batches(batch_url, label, user, password, batch_size=10000,
+                  progress=None):
+    """deletes the nodes of a label and their relationships in transactions
+    of at most `batch_size` each, see `clear_label()`.
+
+    :param batch_url: URL of the batch endpoint of the Neo4j server.
+    :rtype: a dictionary with the number of deleted 'nodes' and
+        'relationships'
+    """
+    if batch_size <= 0:
+        raise ValueError('`batch_size` must be positive')
+
+    counts = {'relationships': 0, 'nodes': 0}
+    label = quote_name(label)
+    for kind, qry in (('relationships', CLEAR_REL_QRY),
+                      ('nodes', CLEAR_NODE_QRY)):
+        data = json.dumps([get_cypher(qry.format(label),
+                                      {"limit": batch_size})])
+        while True:
+            result = post_batch(batch_url, data, user, password)
+            deleted = result[0]['body']['data'][0][0]
+            counts[kind] += deleted
+            if progress is not None and deleted:
+                progress(kind, deleted)
+            if deleted < batch_size:
+                break
+    return counts
+
+
+def replace_label(server_url, graph, user, password, label,
+                  staging_label=None, batch_size=10000, progress=None,
+                  **kwargs):
+    """Replace all nodes with a given label (and their relationships) by
+    the `graph`, without readers ever seeing a half-loaded graph::
+
+        from neonx import replace_label
+
+        results = replace_label("http://localhost:7474/db/data/", G,
+                                'neo4j', 'secret', 'Person',
+                                edge_rel_name='KNOWS', chunk_size=20000)
+
+    The `graph` is uploaded with `write_to_neo` under `staging_label`.
+    Then, in a single transaction, the old nodes lose `label` and the new
+    ones get it. Finally, the old nodes are deleted with `clear_label`.
+
+    The swap changes every old and new node in this one transaction, so
+    the server needs memory for all of them at once. Only the upload and
+    the deletion are split into batches. For labels with tens of millions
+    of nodes, raise the heap of the server, or let the readers select the
+    current graph by a versioned label (e.g. 'Person_v2') and upload each
+    version under a new label with `write_to_neo` instead.
+
+    Leftovers of an earlier, interrupted replacement under `staging_label`
+    are deleted before the upload.
+
+    :param server_url: Server URL for the Neo4j server.
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :param label: The label to replace.
+    :param optional staging_label: The label of the nodes while they are
+        uploaded. Defaults to `label` followed by '_staging'.
+    :param optional batch_size: Maximum number of nodes or relationships
+        deleted per transaction. Must be positive.
+    :param optional progress: A function called with 'nodes' or
+        'relationships' and a number after each request of the upload,
+        and with 'deleted nodes' or 'deleted relationships' while the
+        old nodes are deleted.
+    :param kwargs: Further arguments of `write_to_neo`, e.g.
+        `edge_rel_name` or `chunk_size`.
+    :rtype: The results of `write_to_neo`.
+    """
+    if staging_label is None:
+        staging_label = label + '_staging'
+    retired_label = label + '_retired'
+
+    all_server_urls = get_server_urls(server_url, user, password)
+    batch_url = all_server_urls['batch']
+
+    if progress is None:
+        deleted = None
+    else:
+        def deleted(kind, count):
+            progress('deleted ' + kind, count)
+
+    clear_batches(batch_url, staging_label, user, password, batch_size,
+                  deleted)
+    results = write_to_neo(server_url, graph, user, password,
+                           label=staging_label, progress=progress, **kwargs)
+
+    # the batch endpoint runs all operations in one transaction, which
+    # holds all nodes of both labels
+    data = [get_cypher(RELABEL_QRY.format(quote_name(old), quote_name(new)),
+                       {})
+            for old, new in ((label, retired_label), (staging_label, label))]
+    post_batch(batch_url, json.dumps(data), user, password)
+
+    clear_batches(batch_url, retired_label, user, password, batch_size,
+                  deleted)
+    return results
 
 
 LABEL_QRY = """MATCH (a:{0})-[r]->(b:{1}) RETURN ID(a), r, ID(b);"""
 
+NODE_FILTER_QRY = """MATCH (n:{0}){1} RETURN ID(n), {2};"""
+EDGE_FILTER_QRY = """MATCH (n:{0}){1} WITH n AS a \
+MATCH (a)-[r{2}]->(n:{0}){3} RETURN ID(a), {4}, ID(n);"""
+
+
+def quote_name(name):
+    """quotes a label, relationship type or property name for use in a
+    Cypher query.
+
+    :param name: the name to be quoted
+    :rtype: the name enclosed in backticks
+    """
+    return '`{0}`'.format(name.replace('`', '``'))
+
+
+def get_projection(identifier, properties):
+    """builds a Cypher map literal that only contains the given properties
+    of `identifier`.
+
+    :param identifier: the Cypher identifier of a node or relationship
+    :param properties: an iterable of property names
+    :rtype: a Cypher map literal
+    """
+    return '{{{0}}}'.format(', '.join(
+        '{0}: {1}.{0}'.format(quote_name(p), identifier)
+        for p in properties))
+
+
+def get_where(*predicates):
+    """joins the given Cypher predicates into a WHERE clause. Predicates that
+    are None are ignored.
+
+    :rtype: a (possibly empty) Cypher WHERE clause
+    """
+    predicates = ['({0})'.format(p) for p in predicates if p]
+    if not predicates:
+        return ''
+    return ' WHERE {0}'.format(' AND '.join(predicates))
+
+
+def get_filter_queries(label, node_properties=None, edge_properties=None,
+                       rel_types=None, where=None, edge_where=None,
+                       params=None):
+    """builds the batch operations that fetch the nodes with the given
+    label and the relationships between them, restricted to the given
+    properties, relationship types and predicates.
+
+    :rtype: a list of dictionaries representing Neo4j batch operations
+    """
+    params = params or {}
+    quoted_label = quote_name(label)
+    node_where = get_where(where)
+
+    if node_properties is None and where is None:
+        node_op = {"method": "GET",
+                   "to": '/label/{0}/nodes'.format(label),
+                   "body": {}}
+    else:
+        if node_properties is None:
+            node_ret = 'n'
+        else:
+            node_ret = '{{data: {0}}}'.format(
+                get_projection('n', node_properties))
+        node_op = {"method": "POST", "to": '/cypher', "body": {
+                   "query": NODE_FILTER_QRY.format(quoted_label, node_where,
+                                                   node_ret),
+                   "params": params}}
+
+    if rel_types:
+        types = ':' + '|'.join(quote_name(t) for t in rel_types)
+    else:
+        types = ''
+
+    if edge_properties is None:
+        edge_ret = 'r'
+    else:
+        edge_ret = '{{type: type(r), data: {0}}}'.format(
+            get_projection('r', edge_properties))
+
+    if (edge_properties is None and not rel_types and where is None and
+            edge_where is None):
+        edge_qry = LABEL_QRY.format(label, label)
+    else:
+        edge_qry = EDGE_FILTER_QRY.format(quoted_label, node_where, types,
+                                          get_where(where, edge_where),
+                                          edge_ret)
+    edge_op = {"method": "POST", "to": '/cypher',
+               "body": {"query": edge_qry, "params": params}}
+
+    return [node_op, edge_op]
+
+
+EdgeArrays = namedtuple('EdgeArrays', ['node_ids', 'indptr', 'source',
+                                       'target', 'node_properties',
+                                       'edge_properties'])
+EdgeArrays.__doc__ = """A graph stored as integer arrays.
 
-def get_neo_graph(server_url, label, user, password):
+The nodes are numbered from 0 to n - 1 and `node_ids` maps these indices to
+Neo4j node IDs. The edges are sorted by `source`, so the edges of node ``i``
+are ``source[indptr[i]:indptr[i + 1]]`` (CSR layout). The properties are
+stored as columns, i.e. dictionaries mapping property names to lists with a
+value (or None) for each node or edge."""
+
+# 64 bit, as 'l' is only 32 bit on Windows (Python 2 lacks 'q')
+try:
+    array('q')
+    ID_TYPECODE = 'q'
+except ValueError:
+    ID_TYPECODE = 'l'
+
+
+def get_edge_arrays(nodes, edges):
+    """converts nodes and edges into `EdgeArrays`.
+
+    :param nodes: an iterable of (Neo4j node ID, properties) tuples
+    :param edges: an iterable of (Neo4j node ID, Neo4j node ID, properties)
+        tuples
+    :rtype: `EdgeArrays`
+    """
+    index = {}
+    node_properties = {}
+    for node_id, properties in nodes:
+        i = index.setdefault(node_id, len(index))
+        for k, v in properties.items():
+            node_properties.setdefault(k, {})[i] = v
+
+    edge_list = [(index.setdefault(u, len(index)),
+                  index.setdefault(v, len(index)), properties)
+                 for u, v, properties in edges]
+    edge_list.sort(key=itemgetter(0))
+
+    edge_properties = {}
+    source = array(ID_TYPECODE)
+    target = array(ID_TYPECODE)
+    indptr = array(ID_TYPECODE, [0] * (len(index) + 1))
+    for j, (u, v, properties) in enumerate(edge_list):
+        source.append(u)
+        target.append(v)
+        indptr[u + 1] += 1
+        for k, value in properties.items():
+            edge_properties.setdefault(k, {})[j] = value
+
+    for i in range(len(index)):
+        indptr[i + 1] += indptr[i]
+
+    node_ids = array(ID_TYPECODE, [0] * len(index))
+    for node_id, i in index.items():
+        node_ids[i] = node_id
+
+    def columns(properties, size):
+        return dict((k, [column.get(i) for i in range(size)])
+                    for k, column in properties.items())
+
+    return EdgeArrays(node_ids, indptr, source, target,
+                      columns(node_properties, len(index)),
+                      columns(edge_properties, len(edge_list)))
+
+
+MARKER_NODE_QRY = """MATCH (n:{0}) RETURN count(n), max(ID(n));"""
+MARKER_EDGE_QRY = """MATCH (:{0})-[r]->() RETURN count(r);"""
+
+
+def get_label_marker(batch_url, label, user, password):
+    """returns a change marker of all nodes with a given label and their
+    relationships. The marker consists of the number of nodes, their
+    highest ID and the number of relationships starting at them.
+
+    The relationships are counted with a pattern that Neo4j answers from
+    its count store, without visiting them. The highest node ID needs a
+    scan of the label, which grows with the number of nodes but is much
+    cheaper than fetching the graph.
+
+    :param batch_url: URL of the batch endpoint of the Neo4j server.
+    :param label: The label of the nodes.
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :rtype: a list of integers (or None, if there are no nodes)
+    """
+    label = quote_name(label)
+    data = [{"method": "POST", "to": '/cypher',
+             "body": {"query": qry.format(label), "params": {}}}
+            for qry in (MARKER_NODE_QRY, MARKER_EDGE_QRY)]
+
+    result = post_batch(batch_url, json.dumps(data), user, password)
+
+    return [value for op in result for value in op['body']['data'][0]]
+
+
+def get_neo_graph(server_url, label, user, password, node_properties=None,
+                  edge_properties=None, rel_types=None, where=None,
+                  edge_where=None, params=None, cache=None, output='graph',
+                  profiler=None):
     """Return a graph of all nodes with a given Neo4j label and edges between
     the same nodes.
 
+    By default, all properties of all nodes and relationships are fetched.
+    The amount of data sent by the server can be reduced by only asking for
+    some properties, relationship types or nodes::
+
+        from neonx import get_neo_graph
+
+        graph = get_neo_graph("http://localhost:7474/db/data/", 'Person',
+                              'neo4j', 'secret',
+                              node_properties=['name'],
+                              edge_properties=[],
+                              rel_types=['KNOWS'],
+                              where='n.age > {min_age}',
+                              params={'min_age': 18})
+
+    Numeric pipelines that do not need a NetworkX graph can ask for
+    ``output='arrays'`` instead, which returns the graph as `EdgeArrays`.
+    Unlike a DiGraph, these keep parallel relationships (unless a `cache` is
+    used).
+
+    The node predicate `where` refers to the node as ``n`` and is applied to
+    both ends of a relationship. The relationship predicate `edge_where`
+    refers to the relationship as ``r``.
+
     :param server_url: Server URL for the Neo4j server.
     :param label: The label to retrieve the nodes for.
     :param user: A Neo4j user name.
     :param password: The password belonging to the given Neo4j user name.
+    :param optional node_properties: Names of the node properties to fetch.
+        Defaults to all properties.
+    :param optional edge_properties: Names of the relationship properties to
+        fetch. Defaults to all properties.
+    :param optional rel_types: Relationship types to fetch. Defaults to all
+        types.
+    :param optional where: Cypher predicate the nodes have to match.
+    :param optional edge_where: Cypher predicate the relationships have to
+        match.
+    :param optional params: Parameters used in `where` and `edge_where`.
+    :param optional cache: A `neonx.cache.GraphCache` to reuse graphs
+        retrieved earlier, as long as the label has not changed.
+    :param optional output: 'graph' to return a DiGraph or 'arrays' to
+        return `EdgeArrays`. Defaults to 'graph'.
+    :param optional profiler: A `neonx.profiling.Profiler` that measures
+        the time and memory of each phase of the download.
     :rtype: A `Digraph \
 <http://networkx.github.io/documentation/latest/\
-reference/classes.digraph.html>`_.
+reference/classes.digraph.html>`_ or `EdgeArrays`.
     """
+    if output not in ('graph', 'arrays'):
+        raise ValueError("`output` must be either 'graph' or 'arrays'")
+    if profiler is None:
+        profiler = NO_PROFILER
+
     all_server_urls = get_server_urls(server_url, user, password)
     batch_url = all_server_urls['batch']
 
-    data = [{"method": "GET", "to": '/label/{0}/nodes'.format(label),
-             "body": {}},
-            {"method": "POST", "to": '/cypher', "body": {"query":
-             LABEL_QRY.format(label, label), "params": {}}},
-            ]
+    if cache is not None:
+        from .cache import get_cache_key
+
+        with profiler.phase('cache'):
+            marker = get_label_marker(batch_url, label, user, password)
+            key = get_cache_key(server_url, label,
+                                node_properties=node_properties,
+                                edge_properties=edge_properties,
+                                rel_types=rel_types, where=where,
+                                edge_where=edge_where, params=params)
+            graph = cache.load(key, marker)
+        if graph is not None:
+            if output == 'arrays':
+                with profiler.phase('convert'):
+                    return get_edge_arrays(graph.nodes(data=True),
+                                           graph.edges(data=True))
+            return graph
+
+    data = get_filter_queries(label, node_properties=node_properties,
+                              edge_properties=edge_properties,
+                              rel_types=rel_types, where=where,
+                              edge_where=edge_where, params=params)
+
+    node_data, edge_date = post_batch(batch_url, json.dumps(data), user,
+                                      password, profiler=profiler)
+
+    with profiler.phase('convert'):
+        if data[0]['method'] == 'GET':
+            nodes = [(int(n['self'].rpartition('/')[-1]), n['data'])
+                     for n in node_data['body']]
+        else:
+            nodes = [(node_id, dict((k, v) for k, v in n['data'].items()
+                                    if v is not None))
+                     for node_id, n in node_data['body']['data']]
+
+        edges = []
+        eapp = edges.append
+        for from_node_id, relationship, to_node_id in \
+                edge_date['body']['data']:
+            properties = relationship['data']
+            if edge_properties is not None:
+                properties = dict((k, v) for k, v in properties.items()
+                                  if v is not None)
+            properties['neo_rel_name'] = relationship['type']
+            eapp((from_node_id, to_node_id, properties))
+
+        if output == 'arrays' and cache is None:
+            return get_edge_arrays(nodes, edges)
+
+    import networkx as nx
+
+    with profiler.phase('graph'):
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from(edges)
+
+    if cache is not None:
+        with profiler.phase('cache'):
+            cache.store(key, marker, graph)
+
+    if output == 'arrays':
+        with profiler.phase('convert'):
+            return get_edge_arrays(graph.nodes(data=True),
+                                   graph.edges(data=True))
+    return graph
 
-    result = requests.post(batch_url, data=json.dumps(data), headers=HEADERS)
 
-    check_exception(result)
+SEED_QRY = """MATCH (n{0}) WHERE {1} IN {{keys}} RETURN ID(n), n;"""
+EXPAND_QRY = """MATCH (a) WHERE ID(a) IN {{ids}} \
+MATCH (a){0}[r{1}]{2}(b{3}) \
+RETURN ID(startNode(r)), r, ID(endNode(r)), ID(b), b;"""
+CLOSE_QRY = """MATCH (a) WHERE ID(a) IN {{ids}} \
+MATCH (a)-[r{0}]-{1}(b) WHERE ID(b) IN {{{2}}} \
+RETURN ID(startNode(r)), r, ID(endNode(r));"""
 
-    node_data, edge_date = result.json()
-    graph = nx.DiGraph()
+DIRECTIONS = {'out': ('-', '->'), 'in': ('<-', '-'), 'both': ('-', '-')}
 
-    for n in node_data['body']:
-        node_id = int(n['self'].rpartition('/')[-1])
-        graph.add_node(node_id, **n['data'])
 
-    for n in edge_date['body']['data']:
-        from_node_id, relationship, to_node_id = n
+def get_neo_subgraph(server_url, seeds, user, password, depth=1,
+                     rel_types=None, direction='both', key=None, label=None,
+                     batch_size=1000):
+    """Return the neighbourhood of the `seeds` nodes up to `depth` hops.
+
+    The neighbourhood is expanded on the server, one hop at a time. Each hop
+    is sent as a single batch request of Cypher queries of at most
+    `batch_size` nodes each. Nodes found in earlier hops are not expanded
+    again. Like `networkx.ego_graph`, the result is the subgraph induced by
+    the nodes found: a last query fetches the relationships between the
+    nodes of the last hop and the other nodes, whatever their direction.
+    With `direction='both'`, only the relationships among the nodes of the
+    last hop can be missing, so this query only gets their IDs; otherwise
+    it gets the IDs of all nodes found, once::
 
+        from neonx import get_neo_subgraph
+
+        graph = get_neo_subgraph("http://localhost:7474/db/data/",
+                                 ['alice', 'bob'], 'neo4j', 'secret',
+                                 depth=2, rel_types=['KNOWS'],
+                                 direction='out', key='name',
+                                 label='Person')
+
+    :param server_url: Server URL for the Neo4j server.
+    :param seeds: The keys of the nodes to start from. These are Neo4j node
+        IDs, unless `key` is given.
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :param optional depth: The number of hops to expand. Defaults to 1.
+    :param optional rel_types: Relationship types to follow. Defaults to all
+        types.
+    :param optional direction: One of 'out', 'in' or 'both'. Defaults to
+        'both'.
+    :param optional key: Node property the `seeds` refer to.
+    :param optional label: Only nodes with this label are visited.
+    :param optional batch_size: Maximum number of nodes per Cypher query.
+    :rtype: A `Digraph \
+<http://networkx.github.io/documentation/latest/\
+reference/classes.digraph.html>`_, keyed on the Neo4j node IDs.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError('`direction` must be one of {0}'.format(
+            ', '.join(sorted(DIRECTIONS))))
+
+    all_server_urls = get_server_urls(server_url, user, password)
+    batch_url = all_server_urls['batch']
+
+    label = ':' + quote_name(label) if label else ''
+    if rel_types:
+        types = ':' + '|'.join(quote_name(t) for t in rel_types)
+    else:
+        types = ''
+    left, right = DIRECTIONS[direction]
+
+    if key is None:
+        seed_qry = SEED_QRY.format(label, 'ID(n)')
+    else:
+        seed_qry = SEED_QRY.format(label, 'n.' + quote_name(key))
+    expand_qry = EXPAND_QRY.format(left, types, right, label)
+
+    def post_queries(query, name, values):
+        data = [{"method": "POST", "to": '/cypher',
+                 "body": {"query": query, "params": {name: chunk}}}
+                for chunk in chunks(values, batch_size)]
+        if not data:
+            return []
+        result = post_batch(batch_url, json.dumps(data), user, password)
+        return [row for op in result for row in op['body']['data']]
+
+    import networkx as nx
+
+    graph = nx.DiGraph()
+    for node_id, n in post_queries(seed_qry, 'keys', list(seeds)):
+        graph.add_node(node_id, **n['data'])
+    frontier = list(graph)
+
+    def add_edge(from_node_id, relationship, to_node_id):
         properties = relationship['data']
         properties['neo_rel_name'] = relationship['type']
         graph.add_edge(from_node_id, to_node_id, **properties)
 
+    for _ in range(depth):
+        found = []
+        for row in post_queries(expand_qry, 'ids', frontier):
+            from_node_id, relationship, to_node_id, node_id, n = row
+            if node_id not in graph:
+                graph.add_node(node_id, **n['data'])
+                found.append(node_id)
+            add_edge(from_node_id, relationship, to_node_id)
+        frontier = found
+
+    # all other nodes have been expanded, so only the relationships of the
+    # last hop's nodes can be missing. In both directions, the expansion
+    # has also found those to earlier nodes.
+    if frontier:
+        if direction == 'both':
+            close_qry = CLOSE_QRY.format(types, '>', 'ids')
+            params = {'ids': frontier}
+        else:
+            close_qry = CLOSE_QRY.format(types, '', 'nodes')
+            params = {'ids': frontier, 'nodes': list(graph)}
+        data = json.dumps([get_cypher(close_qry, params)])
+        result = post_batch(batch_url, data, user, password)
+        for row in result[0]['body']['data']:
+            add_edge(*row)
+
     return graph
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .neo import (ResultCollector, generate_edge_chunk, generate_node_chunk,
+                  get_created_ids, get_edge_rounds, get_server_urls,
+                  post_batch)
+from .source import as_source, chunks
+
+
+__all__ = ['write_to_neo_pipelined']
+
+
+# the settings of a serialization process, see `init_worker()`
+WORKER = {}
+
+
+def init_worker(label, encoder, edge_rel_name, edge_rel_key, is_digraph):
+    """stores the upload settings in a serialization process, so they are
+    not sent along with every chunk."""
+    WORKER.update(label=label, encoder=encoder, edge_rel_name=edge_rel_name,
+                  edge_rel_key=edge_rel_key, is_digraph=is_digraph)
+
+
+def encode_nodes(nodes):
+    """serializes a chunk of nodes in a worker process."""
+    return generate_node_chunk(nodes, WORKER['label'], WORKER['encoder'])
+
+
+def encode_edges(edges):
+    """serializes a chunk of edges, whose nodes have already been replaced
+    by their Neo4j IDs, in a worker process."""
+    return generate_edge_chunk(edges, None, WORKER['edge_rel_name'],
+                               WORKER['edge_rel_key'], WORKER['is_digraph'],
+                               WORKER['encoder'])
+
+
+class Pipeline(object):
+    """serializes chunks in worker processes and sends them with sender
+    threads. At most `queue_size` serialized chunks wait for a sender, so
+    the memory used by the pipeline is bounded.
+
+    :param pool: a `multiprocessing.Pool` that serializes the chunks
+    :param send: a function that sends a serialized chunk and returns the
+        batch results
+    :param senders: the number of sender threads
+    :param queue_size: the maximum number of chunks waiting for a sender
+    """
+
+    def __init__(self, pool, send, senders, queue_size):
+        self.pool = pool
+        self.send = send
+        self.senders = senders
+        self.queue_size = queue_size
+
+    def run(self, encode, items, done):
+        """serializes and sends all `items`. `done` is called with each
+        index, item and batch results in a sender thread.
+
+        :param encode: a function serializing one item in a worker process
+        :param items: an iterable of picklable items (e.g. chunks)
+        :param done: a function called after an item has been sent
+        """
+        pending = queue.Queue(self.queue_size)
+        errors = []
+
+        def sender():
+            while True:
+                task = pending.get()
+                if task is None:
+                    return
+                index, item, encoded = task
+                if errors:
+                    continue    # drain the queue after an error
+                try:
+                    done(index, item, self.send(encoded.get()))
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=sender)
+                   for _ in range(self.senders)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for index, item in enumerate(items):
+                if errors:
+                    break
+                encoded = self.pool.apply_async(encode, (item, ))
+                # blocks while `queue_size` chunks are waiting
+                pending.put((index, item, encoded))
+        finally:
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+
+def write_to_neo_pipelined(server_url, graph, user, password,
+                           edge_rel_name=None, label=None, encoder=None,
+                           edge_rel_key=None, chunk_size=10000,
+                           processes=None, senders=2, queue_size=4,
+                           progress=None, response='full',
+                           partition_edges=False, hub_degree=None):
+    """Upload the `graph` like `write_to_neo` with a `chunk_size`, but
+    overlap the serialization of chunks with sending them::
+
+        from neonx.pipeline import write_to_neo_pipelined
+
+        results = write_to_neo_pipelined(
+            "http://localhost:7474/db/data/", G, 'neo4j', 'secret',
+            'LINKS_TO', chunk_size=20000, processes=4, senders=4)
+
+    Chunks are JSON encoded by `processes` worker processes and sent by
+    `senders` threads, so encoding, network transfer and the processing on
+    the server run at the same time. At most `queue_size` encoded chunks
+    wait for a sender; if the server is slower than the encoding, reading
+    the graph pauses until a sender is free.
+
+    All nodes are uploaded before the first relationship. The nodes, edges
+    and `encoder` are sent to the worker processes and must be picklable.
+
+    :param server_url: Server URL for the Neo4j server.
+    :param graph: A NetworkX Graph or a DiGraph or a
+        `neonx.source.GraphSource`.
+    :param user: A Neo4j user name.
+    :param password: The password belonging to the given Neo4j user name.
+    :param optional edge_rel_name: Relationship name between the nodes.
+    :param optional label: It will add this label to the node.
+    :param optional encoder: JSONEncoder object. Defaults to JSONEncoder.
+    :param optional edge_rel_key: Key in edge attributes to use as edge label.
+    :param optional chunk_size: Maximum number of nodes or edges per request.
+    :param optional processes: Number of serialization processes. Defaults
+        to the number of CPUs.
+    :param optional senders: Number of requests sent concurrently.
+    :param optional queue_size: Maximum number of serialized chunks waiting
+        to be sent.
+    :param optional progress: A function called with 'nodes' or
+        'relationships' and the number of nodes or edges after each request.
+    :param optional response: 'full', 'ids' or 'counts', see `write_to_neo`.
+    :param optional partition_edges: True, to send the edges in rounds of
+        batches with disjoint nodes, see `write_to_neo`.
+    :param optional hub_degree: The degree from which on a node is treated
+        as a hub. Defaults to `chunk_size`.
+    :rtype: A list of Neo4j created resources, an array or a dictionary.
+    """
+    from multiprocessing import Pool
+
+    if encoder is None:
+        encoder = json.JSONEncoder()
+
+    if edge_rel_name is None and edge_rel_key is None:
+        raise ValueError(
+            'Must provide either `edge_rel_name` or `edge_rel_key`')
+
+    results = ResultCollector(response)
+    batch_url = get_server_urls(server_url, user, password)['batch']
+
+    source = as_source(graph)
+    is_digraph = source.is_directed()
+    node_ids = {}
+    chunk_results = {}
+    lock = threading.Lock()
+
+    def send(data):
+        return post_batch(batch_url, data, user, password,
+                          compact=results.compact)
+
+    def nodes_done(index, chunk, result):
+        for i, node_id in get_created_ids(result).items():
+            node_ids[chunk[i][0]] = node_id
+        with lock:
+            chunk_results[index] = result
+            if progress is not None:
+                progress('nodes', len(chunk))
+
+    def edges_done(index, chunk, result):
+        with lock:
+            chunk_results[index] = result
+            if progress is not None:
+                progress('relationships', len(chunk))
+
+    def resolved_edges(batches):
+        for chunk in batches:
+            yield [(node_ids[u], node_ids[v], properties)
+                   for u, v, properties in chunk]
+
+    def collect():
+        # keep the order of the chunks, so 'ids' follows the node order
+        for index in sorted(chunk_results):
+            results.add(chunk_results.pop(index))
+
+    pool = Pool(processes, init_worker,
+                (label, encoder, edge_rel_name, edge_rel_key, is_digraph))
+    try:
+        pipeline = Pipeline(pool, send, senders, queue_size)
+        pipeline.run(encode_nodes, chunks(source.nodes(), chunk_size),
+                     nodes_done)
+        collect()
+
+        # a round is finished before the next one starts
+        for batches in get_edge_rounds(source.edges(), chunk_size,
+                                       partition_edges, hub_degree):
+            pipeline.run(encode_edges, resolved_edges(batches), edges_done)
+            collect()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return results.get()
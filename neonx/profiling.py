@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+__all__ = ['Profiler']
+
+
+try:
+    process_time = time.process_time
+except AttributeError:
+    process_time = time.clock
+
+
+def get_tracemalloc():
+    """imports tracemalloc on first use.
+
+    :rtype: the tracemalloc module or None, if it is not available
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    return tracemalloc
+
+
+class NoProfiler(object):
+    """a profiler that measures nothing, used if no `Profiler` is given."""
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+
+NO_PROFILER = NoProfiler()
+
+
+class Profiler(object):
+    """Records the wall and CPU time and the memory allocated by the phases
+    of `write_to_neo` and `get_neo_graph`::
+
+        from neonx import write_to_neo
+        from neonx.profiling import Profiler
+
+        profiler = Profiler(cprofile_path='upload.prof')
+        write_to_neo("http://localhost:7474/db/data/", G, 'neo4j', 'secret',
+                     'LINKS_TO', profiler=profiler)
+        print(profiler.report())
+
+    The phases are 'build' (reading the graph into batch operations),
+    'encode' (JSON encoding), 'request' (sending the request and waiting for
+    the answer) and 'parse' (decoding the answer). `get_neo_graph` adds
+    'convert' (turning the answer into nodes and edges), 'graph' (building
+    the DiGraph) and 'cache'. A phase that runs several times, e.g. once
+    per chunk, is summed up.
+
+    Memory is measured with `tracemalloc`, which is only active during the
+    phases. The peak of a phase is the highest amount of memory allocated
+    since the phase started. Allocations and their peak are tracked for the
+    whole process, not per thread. If phases run in several threads at the
+    same time (``workers > 1``), the peak is not reset for a phase that
+    starts while another thread is in a phase, so the peaks are upper
+    bounds that include the other threads' allocations. Before Python
+    3.12, cProfile only covers the thread that started it, i.e. the first
+    one entering a phase. `summary` and `report` flag concurrent phases.
+
+    :param optional memory: False, to only measure times. Tracing the
+        allocations slows Python down considerably.
+    :param optional cprofile_path: A path the cProfile statistics of all
+        phases are written to by `summary` (e.g. for `pstats`).
+    """
+
+    def __init__(self, memory=True, cprofile_path=None):
+        self.tracemalloc = get_tracemalloc() if memory else None
+        self.cprofile_path = cprofile_path
+        self.cprofile = None
+        self.phases = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.active = 0
+        # the number of active phases per thread
+        self.threads = {}
+        self.concurrent = False
+        self.started_tracing = False
+
+    def start(self):
+        """starts tracing, when the first phase starts."""
+        if self.tracemalloc is not None and not self.tracemalloc.is_tracing():
+            self.tracemalloc.start()
+            self.started_tracing = True
+        if self.cprofile_path is not None:
+            if self.cprofile is None:
+                import cProfile
+
+                self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        """stops tracing, when the last phase has ended."""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.started_tracing:
+            self.tracemalloc.stop()
+            self.started_tracing = False
+
+    def get_memory(self):
+        """returns the currently allocated memory and the peak since the
+        last reset, or None if memory is not measured."""
+        if self.tracemalloc is None:
+            return None
+        return self.tracemalloc.get_traced_memory()
+
+    def reset_peak(self):
+        """resets the peak of the allocated memory (Python 3.9 or newer)."""
+        reset = getattr(self.tracemalloc, 'reset_peak', None)
+        if reset is not None:
+            reset()
+
+    @contextmanager
+    def phase(self, name):
+        """measures a phase::
+
+            with profiler.phase('encode'):
+                data = encoder.encode(entities)
+
+        :param name: the name of the phase
+        """
+        thread = threading.current_thread().ident
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+
+        with self.lock:
+            if self.active == 0:
+                self.start()
+            self.active += 1
+            others = any(t != thread for t in self.threads)
+            self.threads[thread] = self.threads.get(thread, 0) + 1
+            if others:
+                self.concurrent = True
+
+            memory = self.get_memory()
+            if memory is not None:
+                if stack:
+                    # keep the peak of the enclosing phase before the reset
+                    stack[-1][1] = max(stack[-1][1], memory[1])
+                # the peak is shared by all threads, resetting it would
+                # lower the peaks of the other threads' phases
+                if not others:
+                    self.reset_peak()
+                    memory = [memory[0], memory[0]]
+                else:
+                    memory = [memory[0], memory[1]]
+        stack.append(memory)
+
+        wall, cpu = time.time(), process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.time() - wall, process_time() - cpu
+            start = stack.pop()
+            peak = allocated = None
+            memory = self.get_memory()
+            if memory is not None:
+                top = max(start[1], memory[1])
+                peak, allocated = top - start[0], memory[0] - start[0]
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], top)
+
+            with self.lock:
+                self.add(name, wall, cpu, peak, allocated)
+                self.threads[thread] -= 1
+                if not self.threads[thread]:
+                    del self.threads[thread]
+                self.active -= 1
+                if self.active == 0:
+                    self.stop()
+
+    def add(self, name, wall, cpu, peak, allocated):
+        """adds a measurement to the totals of a phase."""
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = dict(
+                calls=0, wall=0.0, cpu=0.0, peak_memory=peak,
+                memory=allocated)
+        else:
+            if peak is not None:
+                phase['peak_memory'] = max(phase['peak_memory'], peak)
+                phase['memory'] += allocated
+        phase['calls'] += 1
+        phase['wall'] += wall
+        phase['cpu'] += cpu
+
+    def summary(self):
+        """returns the measurements of all phases in the order in which
+        they ran first, and writes the cProfile statistics to
+        `cprofile_path`.
+
+        :rtype: a dictionary with the 'phases' (a dictionary mapping phase
+            names to dictionaries of 'calls', 'wall' and 'cpu' seconds,
+            'peak_memory' and net allocated 'memory' in bytes), the total
+            'wall' and 'cpu' seconds, the highest 'peak_memory', the
+            'cprofile' path and 'concurrent', which is True if phases ran
+            in several threads at the same time
+        """
+        with self.lock:
+            phases = OrderedDict((name, dict(phase))
+                                 for name, phase in self.phases.items())
+            if self.cprofile is not None:
+                self.cprofile.dump_stats(self.cprofile_path)
+        peaks = [p['peak_memory'] for p in phases.values()
+                 if p['peak_memory'] is not None]
+        return {'phases': phases,
+                'wall': sum(p['wall'] for p in phases.values()),
+                'cpu': sum(p['cpu'] for p in phases.values()),
+                'peak_memory': max(peaks) if peaks else None,
+                'cprofile': self.cprofile_path,
+                'concurrent': self.concurrent}
+
+    def report(self):
+        """formats the summary as a table.
+
+        :rtype: a string
+        """
+        def size(value):
+            if value is None:
+                return '-'
+            return '{0:.1f} MiB'.format(value / 1048576.0)
+
+        summary = self.summary()
+        rows = [('phase', 'calls', 'wall', 'cpu', 'peak', 'allocated')]
+        for name, p in summary['phases'].items():
+            rows.append((name, str(p['calls']), '{0:.3f}s'.format(p['wall']),
+                         '{0:.3f}s'.format(p['cpu']), size(p['peak_memory']),
+                         size(p['memory'])))
+        rows.append(('total', '', '{0:.3f}s'.format(summary['wall']),
+                     '{0:.3f}s'.format(summary['cpu']),
+                     size(summary['peak_memory']), ''))
+        widths = [max(len(row[i]) for row in rows) for i in range(6)]
+        lines = ['  '.join([row[0].ljust(widths[0])] +
+                           [v.rjust(w) for v, w in zip(row[1:], widths[1:])])
+                 for row in rows]
+        if summary['concurrent']:
+            lines.append('phases ran concurrently: the peaks include other '
+                         'threads and cProfile may only cover one thread')
+        return '\n'.join(lines)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from .source import chunks
+
+
+__all__ = ['schedule_edges']
+
+
+class Round(object):
+    """batches of edges that can be sent concurrently, because no two of
+    them touch the same node.
+
+    :param batch_size: the maximum number of edges per batch
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.batches = []
+        self.owners = {}
+        self.open_batch = None
+
+    def add_edge(self, edge):
+        """adds an edge to a batch that already owns its nodes or to the
+        open batch.
+
+        :param edge: a (from node, to node, properties) tuple
+        :rtype: True, if the edge was added
+        """
+        u, v = edge[0], edge[1]
+        owner_u, owner_v = self.owners.get(u), self.owners.get(v)
+        if owner_u is not None and owner_v is not None and owner_u != owner_v:
+            return False
+
+        i = owner_u if owner_u is not None else owner_v
+        if i is None:
+            if (self.open_batch is None or
+                    len(self.batches[self.open_batch]) >= self.batch_size):
+                self.batches.append([])
+                self.open_batch = len(self.batches) - 1
+            i = self.open_batch
+        elif len(self.batches[i]) >= self.batch_size:
+            return False
+
+        self.batches[i].append(edge)
+        self.owners[u] = self.owners[v] = i
+        return True
+
+    def add_batch(self, batch, nodes):
+        """adds a whole batch, if none of its nodes is owned by another
+        batch of this round.
+
+        :param batch: a list of edges
+        :param nodes: the nodes of the edges
+        :rtype: True, if the batch was added
+        """
+        if any(n in self.owners for n in nodes):
+            return False
+        self.batches.append(batch)
+        i = len(self.batches) - 1
+        for n in nodes:
+            self.owners[n] = i
+        return True
+
+
+def schedule_edges(edges, batch_size, hub_degree=None):
+    """partitions edges into rounds of batches. The batches of a round
+    touch disjoint sets of nodes, so they can be uploaded concurrently
+    without two requests locking the same node::
+
+        from neonx.schedule import schedule_edges
+
+        for batches in schedule_edges(G.edges(data=True), 1000):
+            # send the batches of a round in parallel, then wait for all
+            # of them before starting the next round
+            ...
+
+    Nodes with at least `hub_degree` edges (hubs) would end up in almost
+    every batch. Their edges are therefore grouped by hub into batches of
+    their own, which are spread over consecutive rounds, while the edges
+    between the other nodes fill the remaining room.
+
+    All edges are kept in memory while they are scheduled.
+
+    :param edges: an iterable of (from node, to node, properties) tuples
+    :param batch_size: the maximum number of edges per batch
+    :param optional hub_degree: the degree from which on a node is treated
+        as a hub. Defaults to `batch_size`.
+    :rtype: a list of rounds, each a list of batches (lists of edges)
+    """
+    if hub_degree is None:
+        hub_degree = batch_size
+
+    edges = list(edges)
+    degree = defaultdict(int)
+    for edge in edges:
+        degree[edge[0]] += 1
+        degree[edge[1]] += 1
+
+    hub_edges = defaultdict(list)
+    other_edges = []
+    for edge in edges:
+        u, v = edge[0], edge[1]
+        hub = max((u, v), key=degree.__getitem__)
+        if degree[hub] >= hub_degree:
+            hub_edges[hub].append(edge)
+        else:
+            other_edges.append(edge)
+
+    rounds = []
+
+    # the busiest hubs first, so their batches start in the first rounds
+    for hub in sorted(hub_edges, key=degree.__getitem__, reverse=True):
+        for batch in chunks(hub_edges[hub], batch_size):
+            nodes = set(e[0] for e in batch) | set(e[1] for e in batch)
+            for r in rounds:
+                if r.add_batch(batch, nodes):
+                    break
+            else:
+                rounds.append(Round(batch_size))
+                rounds[-1].add_batch(batch, nodes)
+
+    for edge in other_edges:
+        for r in rounds:
+            if r.add_edge(edge):
+                break
+        else:
+            rounds.append(Round(batch_size))
+            rounds[-1].add_edge(edge)
+
+    return [r.batches for r in rounds]
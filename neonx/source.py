@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+from itertools import islice
+
+
+__all__ = ['GraphSource', 'as_source', 'read_edgelist', 'read_csv']
+
+
+def chunks(items, size):
+    """splits `items` into lists of at most `size` elements.
+
+    :param items: an iterable
+    :param size: the maximum size of a chunk
+    :rtype: a generator of lists
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_iterable(items):
+    """returns a function that iterates over `items`. One-shot iterators
+    (e.g. generators) are copied into a list, so they can be iterated more
+    than once.
+
+    :param items: an iterable or a function returning an iterable
+    :rtype: a function returning an iterator
+    """
+    if callable(items):
+        return items
+    if iter(items) is items:
+        items = list(items)
+    return lambda: items
+
+
+class GraphSource(object):
+    """A graph given as iterables of nodes and edges. It can be passed to
+    `get_geoff`, `generate_data` and `write_to_neo` instead of a NetworkX
+    graph, which avoids building the graph in memory::
+
+        from neonx import write_to_neo
+        from neonx.source import GraphSource
+
+        def edges():
+            with open('edges.txt') as f:
+                for line in f:
+                    yield line.split()
+
+        source = GraphSource(edges=edges)
+        write_to_neo("http://localhost:7474/db/data/", source, 'neo4j',
+                     'secret', 'LINKS_TO')
+
+    Nodes are either node names or (node name, properties) tuples and edges
+    are (from node, to node) or (from node, to node, properties) tuples.
+    Both can be given as functions returning a new iterator, which lets the
+    data be read again whenever it is needed. If `nodes` is omitted, the
+    nodes are collected from the edges; only their names are kept in memory.
+
+    :param optional nodes: an iterable of nodes or a function returning one
+    :param optional edges: an iterable of edges or a function returning one
+    :param optional directed: False, if each edge connects its nodes in both
+        directions. Defaults to True.
+    """
+
+    def __init__(self, nodes=None, edges=(), directed=True):
+        self.get_edges = get_iterable(edges)
+        self.get_nodes = None if nodes is None else get_iterable(nodes)
+        self.directed = directed
+
+    def is_directed(self):
+        """returns True, if the graph is directed."""
+        return self.directed
+
+    def nodes(self):
+        """iterates over the nodes.
+
+        :rtype: an iterator of (node name, properties) tuples
+        """
+        if self.get_nodes is None:
+            seen = set()
+            for edge in self.get_edges():
+                for node_name in edge[:2]:
+                    if node_name not in seen:
+                        seen.add(node_name)
+                        yield node_name, {}
+            return
+
+        for node in self.get_nodes():
+            if (isinstance(node, tuple) and len(node) == 2 and
+                    isinstance(node[1], dict)):
+                yield node
+            else:
+                yield node, {}
+
+    def edges(self):
+        """iterates over the edges.
+
+        :rtype: an iterator of (from node, to node, properties) tuples
+        """
+        for edge in self.get_edges():
+            if len(edge) == 2:
+                yield edge[0], edge[1], {}
+            else:
+                yield edge[0], edge[1], edge[2]
+
+
+def as_source(graph):
+    """wraps a NetworkX graph into a `GraphSource`. A `GraphSource` is
+    returned unchanged.
+
+    :param graph: A NetworkX Graph or DiGraph or a `GraphSource`
+    :rtype: A `GraphSource`
+    """
+    if isinstance(graph, GraphSource):
+        return graph
+    return GraphSource(nodes=lambda: graph.nodes(data=True),
+                       edges=lambda: graph.edges(data=True),
+                       directed=graph.is_directed())
+
+
+def open_text(path):
+    """opens a (possibly gzip compressed) text file for reading.
+
+    :param path: the path of the file. Files ending in '.gz' are
+        decompressed.
+    :rtype: a file object
+    """
+    if path.endswith('.gz'):
+        import gzip
+
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8')
+    return io.open(path, encoding='utf-8')
+
+
+def read_edgelist(path, delimiter=None, comments='#', nodetype=None,
+                  directed=True):
+    """streams a graph from an edge list file. Each line contains two node
+    names, optionally followed by a JSON object of edge properties::
+
+        1 2
+        2 3 {"weight": 0.5}
+
+    The file is read whenever the nodes or edges are needed and is never
+    held in memory.
+
+    :param path: the path of the file. Files ending in '.gz' are
+        decompressed.
+    :param optional delimiter: the string separating the node names.
+        Defaults to whitespace.
+    :param optional comments: lines starting with this string are ignored.
+    :param optional nodetype: a function converting node names, e.g. `int`.
+    :param optional directed: False, if the edges are undirected.
+    :rtype: A `GraphSource`
+    """
+    def edges():
+        with open_text(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or (comments and line.startswith(comments)):
+                    continue
+                fields = line.split(delimiter, 2)
+                from_node, to_node = fields[0], fields[1]
+                if nodetype is not None:
+                    from_node, to_node = nodetype(from_node), nodetype(to_node)
+                if len(fields) > 2:
+                    yield from_node, to_node, json.loads(fields[2])
+                else:
+                    yield from_node, to_node, {}
+
+    return GraphSource(edges=edges, directed=directed)
+
+
+def read_csv(path, source='source', target='target', nodes_path=None,
+             node_key='id', delimiter=',', nodetype=None, directed=True):
+    """streams a graph from CSV files with a header row. The remaining
+    columns are used as (string) properties; empty fields are skipped::
+
+        source,target,since
+        1,2,2011
+
+    :param path: the path of the edge file. Files ending in '.gz' are
+        decompressed.
+    :param optional source: the column of the from node.
+    :param optional target: the column of the to node.
+    :param optional nodes_path: the path of an optional node file. Defaults
+        to collecting the nodes from the edges.
+    :param optional node_key: the column of the node name in the node file.
+    :param optional delimiter: the field delimiter.
+    :param optional nodetype: a function converting node names, e.g. `int`.
+    :param optional directed: False, if the edges are undirected.
+    :rtype: A `GraphSource`
+    """
+    import csv
+
+    convert = nodetype or (lambda name: name)
+
+    def rows(file_path, keys):
+        with open_text(file_path) as f:
+            for row in csv.DictReader(f, delimiter=delimiter):
+                names = [convert(row.pop(k)) for k in keys]
+                properties = dict((k, v) for k, v in row.items() if v != '')
+                yield names, properties
+
+    def edges():
+        for (from_node, to_node), properties in rows(path, (source, target)):
+            yield from_node, to_node, properties
+
+    def nodes():
+        for (node_name, ), properties in rows(nodes_path, (node_key, )):
+            yield node_name, properties
+
+    return GraphSource(nodes=nodes if nodes_path else None, edges=edges,
+                       directed=directed)
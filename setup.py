@@ -32,6 +32,9 @@ setup(
     include_package_data=True,
     install_requires=['networkx', 'requests'
     ],
+    entry_points={
+        'console_scripts': ['neonx = neonx.cli:main'],
+    },
     license="MIT",
     zip_safe=False,
     keywords='neonx',
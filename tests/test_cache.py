@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_cache
+----------------------------------
+
+Tests for `cache` module.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from neonx.cache import GraphCache, dump_graph, get_cache_key
+
+import networkx as nx
+
+
+class TestGraphCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.graph = nx.DiGraph()
+        self.graph.add_node(1, name='a')
+        self.graph.add_node(2, name='b')
+        self.graph.add_edge(1, 2, neo_rel_name='KNOWS', since=2011)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cache_key(self):
+        key = get_cache_key('http://localhost:7474/db/data/', 'Node',
+                            where=None, rel_types=['KNOWS'])
+        self.assertEqual(key, get_cache_key('http://localhost:7474/db/data/',
+                                            'Node', rel_types=['KNOWS'],
+                                            where=None))
+        self.assertNotEqual(key, get_cache_key(
+            'http://localhost:7474/db/data/', 'Node', rel_types=['LIKES'],
+            where=None))
+
+    def test_store_load(self):
+        cache = GraphCache(self.directory)
+        cache.store('key', [2, 2, 1, 1], self.graph)
+
+        graph = cache.load('key', [2, 2, 1, 1])
+        self.assertEqual(dict(graph.nodes(data=True)),
+                         dict(self.graph.nodes(data=True)))
+        self.assertEqual(list(graph.edges(data=True)),
+                         list(self.graph.edges(data=True)))
+
+    def test_snapshot_is_json(self):
+        data = json.loads(zlib.decompress(dump_graph(self.graph)).decode(
+            'utf-8'))
+        self.assertEqual(data, [[[1, {'name': 'a'}], [2, {'name': 'b'}]],
+                                [[1, 2, {'neo_rel_name': 'KNOWS',
+                                         'since': 2011}]]])
+
+    def test_stale(self):
+        cache = GraphCache(self.directory)
+        cache.store('key', [2, 2, 1, 1], self.graph)
+
+        self.assertEqual(cache.load('key', [3, 3, 1, 1]), None)
+        self.assertEqual(cache.load('other', [2, 2, 1, 1]), None)
+
+        cache = GraphCache(self.directory, max_age=-1)
+        self.assertEqual(cache.load('key', [2, 2, 1, 1]), None)
+
+    def test_corrupt(self):
+        cache = GraphCache(self.directory)
+        cache.store('key', [2, 2, 1, 1], self.graph)
+        path = cache.get_path('key')
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        header = data.split(b'\n', 1)[0] + b'\n'
+        snapshot = dump_graph(self.graph)
+        for corrupt in (data[:-10], header + b'garbage',
+                        header + zlib.compress(b'[1, 2, 3]'),
+                        header + zlib.compress(b'[[[1]], []]'),
+                        header + snapshot[:len(snapshot) // 2]):
+            with open(path, 'wb') as f:
+                f.write(corrupt)
+            self.assertEqual(cache.load('key', [2, 2, 1, 1]), None)
+
+    def test_evict(self):
+        cache = GraphCache(self.directory)
+        cache.store('old', None, self.graph)
+        size = os.path.getsize(cache.get_path('old'))
+        os.utime(cache.get_path('old'), (0, 0))
+
+        cache.max_size = size
+        cache.store('new', None, self.graph)
+
+        self.assertEqual(cache.load('old', None), None)
+        self.assertNotEqual(cache.load('new', None), None)
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
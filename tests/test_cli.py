@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_cli
+----------------------------------
+
+Tests for `cli` module.
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from neonx.cli import main
+
+import httpretty
+
+
+BATCH_URL = '{"batch":"http://localhost:7474/db/data/batch"}'
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, 'edges.txt')
+        with open(self.input, 'w') as f:
+            f.write('1 2 {"label": "KNOWS"}\n2 3\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_geoff(self):
+        output = os.path.join(self.directory, 'graph.geoff')
+        main(['geoff', self.input, output, '--rel-name', 'LINK_TO',
+              '--compress'])
+
+        with gzip.open(output + '.gz', 'rb') as f:
+            self.assertEqual(f.read().decode('utf-8'), """(1)
+(2)
+(3)
+(1)-[:LINK_TO {"label": "KNOWS"}]->(2)
+(2)-[:LINK_TO]->(3)""")
+
+    def test_batch_export(self):
+        main(['batch-export', self.input, self.directory, '--rel-key',
+              'label', '--rel-name', 'LINK_TO', '--label', 'Node',
+              '--shards', '2'])
+
+        def read(name):
+            with gzip.open(os.path.join(self.directory, name), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+
+        first, second = read('shard-0.json.gz'), read('shard-1.json.gz')
+        self.assertEqual(first[0]['body']['params']['rows'],
+                         [{'id': '1', 'properties': {}},
+                          {'id': '2', 'properties': {}},
+                          {'id': '3', 'properties': {}}])
+        self.assertTrue('[r:`LINK_TO`]' in first[1]['body']['query'])
+        self.assertTrue('[r:`KNOWS`]' in second[0]['body']['query'])
+
+    def test_csv_export(self):
+        main(['csv-export', self.input, self.directory, '--rel-name',
+              'LINK_TO', '--rel-key', 'label', '--label', 'Node'])
+
+        with io.open(os.path.join(self.directory, 'nodes.csv')) as f:
+            self.assertEqual(f.read().splitlines(),
+                             [':ID,:LABEL', '1,Node', '2,Node', '3,Node'])
+        with io.open(os.path.join(self.directory, 'relationships.csv')) as f:
+            self.assertEqual(f.read().splitlines(),
+                             [':START_ID,:END_ID,:TYPE,label',
+                              '1,2,KNOWS,KNOWS', '2,3,LINK_TO,'])
+
+    def test_cypher_shards(self):
+        main(['cypher', self.input, self.directory, '--rel-key', 'label',
+              '--rel-name', 'LINK_TO', '--label', 'Node', '--shards', '2',
+              '--batch-size', '1'])
+
+        with io.open(os.path.join(self.directory, 'nodes-1.cypher')) as f:
+            self.assertEqual(f.read().splitlines()[1],
+                             ':param batch => [{`id`: "2", `properties`: {}}]')
+        with io.open(os.path.join(self.directory,
+                                  'relationships-0.cypher')) as f:
+            self.assertTrue('[r:`KNOWS`]' in f.read())
+        with io.open(os.path.join(self.directory,
+                                  'relationships-1.cypher')) as f:
+            self.assertTrue('[r:`LINK_TO`]' in f.read())
+
+    def test_missing_rel_name(self):
+        self.assertRaises(SystemExit, main,
+                          ['csv-export', self.input, self.directory])
+
+    def test_merge_key_without_label(self):
+        self.assertRaises(SystemExit, main,
+                          ['upload', 'http://localhost:7474/db/data/',
+                           self.input, '--rel-name', 'LINK_TO',
+                           '--merge-key', 'name'])
+
+    @httpretty.activate
+    def test_upload(self):
+        requests = []
+
+        def request_callback(request, uri, headers):
+            data = json.loads(request.body.decode('utf-8'))
+            requests.append(data)
+            results = [{'id': op['id'],
+                        'location': 'http://localhost/db/data/node/{0}'.format(
+                            len(requests) * 10 + op['id'])}
+                       for op in data if 'id' in op]
+            return (200, headers, json.dumps(results))
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        main(['upload', 'http://localhost:7474/db/data/', self.input,
+              '--user', 'neo4j', '--password', 'secret',
+              '--rel-name', 'LINK_TO', '--chunk-size', '2', '--stats'])
+
+        self.assertEqual([len(r) for r in requests], [2, 1, 2])
+        self.assertEqual(requests[2][0]['to'], '/node/10/relationships')
+        self.assertEqual(requests[2][0]['body']['to'], '/node/11')
+        self.assertEqual(requests[2][1]['to'], '/node/11/relationships')
+        self.assertEqual(requests[2][1]['body']['to'], '/node/20')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_cypher
+----------------------------------
+
+Tests for `cypher` module.
+"""
+
+import datetime
+import io
+import json
+import unittest
+
+from neonx.cypher import get_literal, write_cypher
+from neonx.source import GraphSource
+
+import networkx as nx
+
+
+class DateEncoder(json.JSONEncoder):
+
+    def default(self, o):
+        if isinstance(o, datetime.date):
+            return o.strftime('%Y-%m-%d')
+        return json.JSONEncoder.default(self, o)
+
+
+class TestGetLiteral(unittest.TestCase):
+
+    def test_literals(self):
+        encoder = DateEncoder()
+        self.assertEqual(get_literal(None, encoder), 'null')
+        self.assertEqual(get_literal([True, False, 1, 2.5], encoder),
+                         '[true, false, 1, 2.5]')
+        self.assertEqual(get_literal(1e20, encoder), '1e20')
+        self.assertEqual(get_literal(u'it\'s "\u00e9"\n', encoder),
+                         u'"it\'s \\"\u00e9\\"\\n"')
+        self.assertEqual(get_literal({'a`b': datetime.date(2014, 1, 2)},
+                                     encoder),
+                         '{`a``b`: "2014-01-02"}')
+
+    def test_invalid_literals(self):
+        encoder = json.JSONEncoder()
+        self.assertRaises(ValueError, get_literal, float('nan'), encoder)
+        self.assertRaises(TypeError, get_literal, object(), encoder)
+
+
+class TestWriteCypher(unittest.TestCase):
+
+    def test_write_cypher(self):
+        graph = nx.Graph()
+        graph.add_node(1, name='a')
+        graph.add_node(2)
+        graph.add_edge(1, 2, type='KNOWS')
+
+        f = io.StringIO()
+        counts = write_cypher(graph, f, edge_rel_name='LINKS_TO',
+                              edge_rel_key='type', label='Person')
+        self.assertEqual(counts, {'nodes': 2, 'relationships': 2})
+        self.assertEqual(f.getvalue().splitlines(), [
+            'CREATE INDEX IF NOT EXISTS FOR (n:`Person`) '
+            'ON (n.`_neonx_id`);',
+            ':begin',
+            ':param batch => [{`id`: 1, `properties`: {`name`: "a"}}, '
+            '{`id`: 2, `properties`: {}}]',
+            'UNWIND $batch AS row CREATE (n:`Person` {`_neonx_id`: row.id}) '
+            'SET n += row.properties;',
+            ':commit',
+            'CALL db.awaitIndexes();',
+            ':begin',
+            ':param batch => [{`start`: 1, `end`: 2, `properties`: '
+            '{`type`: "KNOWS"}}, {`start`: 2, `end`: 1, `properties`: '
+            '{`type`: "KNOWS"}}]',
+            'UNWIND $batch AS row '
+            'MATCH (a:`Person` {`_neonx_id`: row.start}) '
+            'MATCH (b:`Person` {`_neonx_id`: row.end}) '
+            'CREATE (a)-[r:`KNOWS`]->(b) SET r += row.properties;',
+            ':commit'])
+
+    def test_batches_and_shards(self):
+        source = GraphSource(nodes=[(i, {}) for i in range(5)],
+                             edges=[(i, i + 1, {'type': t})
+                                    for i, t in enumerate('ABAA')])
+        files = [io.StringIO(), io.StringIO()]
+        edge_files = [io.StringIO(), io.StringIO()]
+        counts = write_cypher(source, files, edge_files, edge_rel_key='type',
+                              label='Node', batch_size=2, commit_size=3)
+        self.assertEqual(counts, {'nodes': 5, 'relationships': 4})
+
+        def batches(f):
+            return [line for line in f.getvalue().splitlines()
+                    if line.startswith(':param')]
+
+        # the node batches alternate between the shards
+        self.assertEqual(len(batches(files[0])), 2)
+        self.assertEqual(len(batches(files[1])), 1)
+        self.assertFalse('MATCH' in files[0].getvalue())
+
+        # a transaction is committed after at least `commit_size` rows
+        self.assertEqual(files[0].getvalue().count(':commit'), 1)
+        self.assertEqual(files[0].getvalue().splitlines()[-1], ':commit')
+
+        # one batch per relationship name, flushed when full
+        lines = edge_files[0].getvalue() + edge_files[1].getvalue()
+        self.assertEqual(lines.count('[r:`A`]'), 2)
+        self.assertEqual(lines.count('[r:`B`]'), 1)
+        self.assertTrue('CREATE INDEX' in files[0].getvalue())
+        self.assertFalse('CREATE INDEX' in files[1].getvalue())
+
+    def test_invalid_arguments(self):
+        graph = nx.Graph()
+        self.assertRaises(ValueError, write_cypher, graph, io.StringIO(),
+                          label='Node')
+        self.assertRaises(ValueError, write_cypher, graph,
+                          [io.StringIO(), io.StringIO()],
+                          edge_rel_name='LINKS_TO', label='Node')
+        self.assertRaises(ValueError, write_cypher, graph, io.StringIO(),
+                          edge_rel_name='LINKS_TO')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_encoders
+----------------------------------
+
+Tests for `encoders` module.
+"""
+
+import datetime
+import json
+import unittest
+
+from neonx import get_geoff
+from neonx.encoders import ScientificEncoder, iter_converted
+from neonx.neo import generate_data
+
+import networkx as nx
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+class TestScientificEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = ScientificEncoder()
+
+    def test_native(self):
+        rows = [{'a': 1, 'b': 'x'}, {}]
+        self.assertTrue(self.encoder.convert_properties(rows) is rows)
+
+    def test_dates(self):
+        rows = [{'d': datetime.date(2012, 1, 1)},
+                {'d': datetime.datetime(2012, 1, 1, 10, 30)},
+                {'d': 'today'}]
+        converted = self.encoder.convert_properties(rows)
+        self.assertEqual(converted, [{'d': '2012-01-01'},
+                                     {'d': '2012-01-01T10:30:00'},
+                                     {'d': 'today'}])
+        # the input is not changed
+        self.assertEqual(rows[0]['d'], datetime.date(2012, 1, 1))
+        self.assertTrue(converted[2] is rows[2])
+
+    def test_iter_converted(self):
+        items = [(1, {'d': datetime.date(2012, 1, 1)}), (2, {})]
+        self.assertEqual(list(iter_converted(items, self.encoder, size=1)),
+                         [(1, {'d': '2012-01-01'}), (2, {})])
+
+        encoder = json.JSONEncoder()
+        self.assertEqual(list(iter_converted(items, encoder)), items)
+
+    @unittest.skipIf(np is None, 'requires NumPy')
+    def test_numpy(self):
+        rows = [{'i': np.int64(1), 'f': np.float32(0.5), 'b': np.bool_(True),
+                 'a': np.arange(3), 't': np.datetime64('2012-01-01')},
+                {'i': np.int64(2), 'f': 1.5,
+                 'a': np.array([[1.5]]), 't': np.datetime64('NaT')}]
+        converted = self.encoder.convert_properties(rows)
+        self.assertEqual(converted, [
+            {'i': 1, 'f': 0.5, 'b': True, 'a': [0, 1, 2], 't': '2012-01-01'},
+            {'i': 2, 'f': 1.5, 'a': [[1.5]], 't': None}])
+        self.assertEqual(type(converted[0]['i']), int)
+
+        self.assertEqual(self.encoder.encode({'x': [np.int32(3)]}),
+                         '{"x": [3]}')
+
+        # nested datetimes are converted like a column of them
+        self.assertEqual(self.encoder.encode(
+            [np.datetime64('2012-01-01T10:00:00.000000001'),
+             np.datetime64('2012-01-01T10:00:00', 'ns'),
+             np.datetime64('NaT'), np.datetime64('2012-01-01')]),
+            '["2012-01-01T10:00:00.000000001", "2012-01-01T10:00:00", null, '
+            '"2012-01-01"]')
+
+    @unittest.skipIf(pd is None, 'requires pandas')
+    def test_pandas(self):
+        rows = [{'t': pd.Timestamp('2012-01-01 10:00:00.5')},
+                {'t': pd.Timestamp('2012-01-02')},
+                {'t': pd.NaT}]
+        self.assertEqual(self.encoder.convert_properties(rows),
+                         [{'t': '2012-01-01T10:00:00.500000000'},
+                          {'t': '2012-01-02T00:00:00.000000000'},
+                          {'t': None}])
+
+        # nanoseconds are kept, like in a datetime64[ns] column
+        rows = [{'t': pd.Timestamp('2012-01-01 10:00:00.123456789')}]
+        self.assertEqual(self.encoder.convert_properties(rows),
+                         [{'t': '2012-01-01T10:00:00.123456789'}])
+
+        rows = [{'t': pd.Timestamp('2012-01-01', tz='UTC')}]
+        self.assertEqual(self.encoder.convert_properties(rows),
+                         [{'t': '2012-01-01T00:00:00+00:00'}])
+
+    @unittest.skipIf(np is None, 'requires NumPy')
+    def test_serializers(self):
+        graph = nx.DiGraph()
+        graph.add_node(0, weight=np.float64(0.5))
+        graph.add_node(1)
+        graph.add_edge(0, 1, count=np.int64(3))
+
+        self.assertEqual(get_geoff(graph, 'LINK_TO', ScientificEncoder()),
+                         '(0 {"weight": 0.5})\n(1)\n'
+                         '(0)-[:LINK_TO {"count": 3}]->(1)')
+
+        data = json.loads(generate_data(graph, 'LINK_TO',
+                                        encoder=ScientificEncoder()))
+        self.assertEqual(data[0]['body'], {'weight': 0.5})
+        self.assertEqual(data[2]['body']['data'], {'count': 3})
+
+        self.assertRaises(TypeError, get_geoff, graph, 'LINK_TO')
+
+
+if __name__ == '__main__':
+    unittest.main()
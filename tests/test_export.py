@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_export
+----------------------------------
+
+Tests for `export` module.
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from neonx.export import write_csv, write_shards
+from neonx.source import GraphSource
+
+
+class TestWriteCsv(unittest.TestCase):
+
+    def test_types(self):
+        source = GraphSource(
+            nodes=[(1, {'w': 1.5, 'since': 2001, 'flag': True,
+                        'tags': ['x', 'y'], 'name': 'a'}),
+                   (2, {'w': 2, 'since': None, 'tags': [], 'mixed': 1}),
+                   (3, {'ids': [1, 2.5], 'mixed': 'b', 'nested': [[1]]})],
+            edges=[(1, 2, {'w': 0.5}), (2, 3, {})])
+        nodes_file, edges_file = io.StringIO(), io.StringIO()
+        write_csv(source, nodes_file, edges_file, 'LINKS_TO', 'Node')
+
+        self.assertEqual(nodes_file.getvalue().splitlines(), [
+            ':ID,flag:boolean,ids:double[],mixed,name,nested,since:long,'
+            'tags:string[],w:double,:LABEL',
+            '1,true,,,a,,2001,x;y,1.5,Node',
+            '2,,,1,,,,,2,Node',
+            '3,,1;2.5,b,,[[1]],,,,Node'])
+        self.assertEqual(edges_file.getvalue().splitlines(), [
+            ':START_ID,:END_ID,:TYPE,w:double',
+            '1,2,LINKS_TO,0.5',
+            '2,3,LINKS_TO,'])
+
+
+class TestWriteShards(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.directory, 'shard-{0}.gz'.format(i))
+                      for i in range(2)]
+        self.source = GraphSource(
+            nodes=[(1, {'name': 'a'}), (2, {}), (3, {}), (4, {})],
+            edges=[(1, 2, {'type': 'KNOWS'}), (2, 1, {}), (3, 4, {})])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, path):
+        with gzip.open(path, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def test_write_shards(self):
+        counts = write_shards(self.source, self.paths,
+                              edge_rel_name='LINK_TO', edge_rel_key='type',
+                              label='Node', batch_size=2)
+        self.assertEqual(counts, {'nodes': 4, 'relationships': 3})
+
+        # the batches of nodes and relationships are spread over the shards
+        first, second = [self.read(path) for path in self.paths]
+        self.assertEqual([op['to'] for op in first + second],
+                         ['/cypher'] * 4)
+        self.assertEqual(first[0]['body']['params'],
+                         {'rows': [{'id': 1, 'properties': {'name': 'a'}},
+                                   {'id': 2, 'properties': {}}]})
+        self.assertEqual(second[0]['body']['params']['rows'],
+                         [{'id': 3, 'properties': {}},
+                          {'id': 4, 'properties': {}}])
+
+        # the nodes are merged by the label and the name
+        self.assertEqual(first[0]['body']['query'],
+                         'UNWIND {rows} AS row MERGE (n:`Node` '
+                         '{`_neonx_id`: row.id}) SET n += row.properties;')
+
+        # so are the nodes of the relationships, so each shard stands alone
+        query = first[1]['body']['query']
+        self.assertTrue('MERGE (a:`Node` {`_neonx_id`: row.start}) '
+                        'MERGE (b:`Node` {`_neonx_id`: row.end})' in query)
+        self.assertTrue('MERGE (a)-[r:`LINK_TO`]->(b)' in query)
+        self.assertEqual(first[1]['body']['params']['rows'],
+                         [{'start': 2, 'end': 1, 'properties': {}},
+                          {'start': 3, 'end': 4, 'properties': {}}])
+        self.assertTrue('[r:`KNOWS`]' in second[1]['body']['query'])
+        self.assertEqual(second[1]['body']['params']['rows'],
+                         [{'start': 1, 'end': 2,
+                           'properties': {'type': 'KNOWS'}}])
+
+    def test_processes(self):
+        write_shards(self.source, self.paths, edge_rel_name='LINK_TO',
+                     label='Node', batch_size=2, processes=2)
+        expected = [self.read(path) for path in self.paths]
+        write_shards(self.source, self.paths, edge_rel_name='LINK_TO',
+                     label='Node', batch_size=2)
+        self.assertEqual([self.read(path) for path in self.paths], expected)
+
+    def test_undirected(self):
+        source = GraphSource(nodes=self.source.nodes(),
+                             edges=self.source.edges(), directed=False)
+        counts = write_shards(source, self.paths[:1],
+                              edge_rel_name='LINK_TO', label='Node')
+        self.assertEqual(counts, {'nodes': 4, 'relationships': 6})
+        operations = self.read(self.paths[0])
+        self.assertEqual(len(operations), 2)
+        self.assertEqual(
+            [(row['start'], row['end'])
+             for row in operations[1]['body']['params']['rows']],
+            [(1, 2), (2, 1), (2, 1), (1, 2), (3, 4), (4, 3)])
+
+    def test_empty_shard(self):
+        write_shards(GraphSource(nodes=[(1, {})]), self.paths,
+                     edge_rel_name='LINK_TO', label='Node')
+        self.assertEqual(len(self.read(self.paths[0])), 1)
+        self.assertEqual(self.read(self.paths[1]), [])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, write_shards, self.source, self.paths,
+                          label='Node')
+        self.assertRaises(ValueError, write_shards, self.source, self.paths,
+                          edge_rel_name='LINK_TO')
+        self.assertRaises(ValueError, write_shards, self.source, [],
+                          edge_rel_name='LINK_TO', label='Node')
+
+
+if __name__ == '__main__':
+    unittest.main()
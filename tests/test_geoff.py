@@ -43,6 +43,18 @@ class TestGetGeoff(unittest.TestCase):
         graph[0][1]['debug'] = False
         self.assertEqual(get_geoff(graph, 'LINK_TO'), result)
 
+    def test_get_geoff_edge_rel_key(self):
+        result = """(0)
+(1)
+(2)
+(0)-[:KNOWS {"type": "KNOWS"}]->(1)
+(0)-[:LINK_TO]->(2)"""
+        graph = nx.balanced_tree(2, 1, create_using=nx.DiGraph())
+        graph[0][1]['type'] = 'KNOWS'
+        self.assertEqual(get_geoff(graph, 'LINK_TO', edge_rel_key='type'),
+                         result)
+        self.assertRaises(ValueError, get_geoff, graph)
+
 
 class DateEncoder(json.JSONEncoder):
 
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_init
+----------------------------------
+
+Tests for the lazy imports of the `neonx` package.
+"""
+
+import subprocess
+import sys
+import unittest
+
+import neonx
+
+
+def get_loaded_modules(statement):
+    """runs `statement` in a fresh interpreter and returns the heavy modules
+    it loaded."""
+    script = ("import sys\n{0}\nprint(' '.join(sorted(m for m in "
+              "('networkx', 'requests') if m in sys.modules)))")
+    output = subprocess.check_output(
+        [sys.executable, '-c', script.format(statement)])
+    return output.decode('utf-8').split()
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'requires PEP 562')
+class TestLazyImports(unittest.TestCase):
+
+    def test_import(self):
+        self.assertEqual(get_loaded_modules('import neonx'), [])
+
+    def test_geoff(self):
+        self.assertEqual(get_loaded_modules('from neonx import get_geoff'),
+                         [])
+
+    def test_neo(self):
+        self.assertEqual(get_loaded_modules('from neonx import write_to_neo'),
+                         [])
+
+    def test_cli(self):
+        self.assertEqual(get_loaded_modules('import neonx.cli'), [])
+
+    def test_public_api(self):
+        for name in neonx.__all__:
+            self.assertTrue(callable(getattr(neonx, name)))
+            self.assertTrue(name in dir(neonx))
+        self.assertRaises(AttributeError, getattr, neonx, 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
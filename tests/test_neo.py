@@ -16,9 +16,18 @@ NEO4J_USER=neo4j NEO4J_PASS=secret python setup.py test
 
 import os
 import json
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
-from neonx.neo import generate_data, write_to_neo, get_neo_graph
+from neonx.neo import (generate_data, write_to_neo, get_neo_graph,
+                       get_filter_queries, get_neo_subgraph, EdgeArrays,
+                       get_edge_arrays, iter_json_array, get_merge_keys,
+                       clear_label, replace_label, get_edge_rounds,
+                       imap_bounded, LABEL_QRY)
+from neonx.cache import GraphCache
 
 import httpretty
 import networkx as nx
@@ -143,6 +152,375 @@ class TestGenerateNeoData(unittest.TestCase):
         self.assertRaises(Exception, f)
 
 
+class TestCompactResponse(unittest.TestCase):
+
+    def test_iter_json_array(self):
+        data = json.dumps([{"id": 0, "location": "/node/12"}, 123, "\u00e9",
+                           [1, {"a": None}], 4.5]).encode('utf-8')
+        for size in (1, 2, 3, 100):
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(list(iter_json_array(chunks)), json.loads(data))
+
+        self.assertEqual(list(iter_json_array([b' [ ] '])), [])
+        self.assertRaises(ValueError, list, iter_json_array([b'[1, {"a"']))
+        self.assertRaises(ValueError, list, iter_json_array([b'{}']))
+
+    def register_batch(self):
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        def request_callback(request, uri, headers):
+            self.assertEqual(request.headers.get('X-Stream'), 'true')
+            results = []
+            for op in json.loads(request.body.decode('utf-8')):
+                if op['to'] == '/node':
+                    results.append({'id': op['id'], 'body': {'data': {}},
+                                    'location': 'http://localhost:7474/db/'
+                                    'data/node/{0}'.format(op['id'] + 5)})
+                elif op['to'].endswith('/relationships'):
+                    results.append({'body': {'data': {}},
+                                    'location': 'http://localhost:7474/db/'
+                                    'data/relationship/1'})
+                else:
+                    results.append({'body': None})
+            return (200, headers, json.dumps(results))
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+    @httpretty.activate
+    def test_ids(self):
+        self.register_batch()
+        graph = nx.balanced_tree(2, 1, create_using=nx.DiGraph())
+        result = write_to_neo("http://localhost:7474/db/data/", graph,
+                              edge_rel_name="LINKS_TO", label="ITEM",
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              response='ids')
+        self.assertEqual(list(result), [5, 6, 7])
+
+    @httpretty.activate
+    def test_counts(self):
+        self.register_batch()
+        graph = nx.balanced_tree(2, 1)
+        for chunk_size in (None, 2):
+            for partition_edges in (False, True):
+                result = write_to_neo("http://localhost:7474/db/data/", graph,
+                                      edge_rel_name="LINKS_TO", label="ITEM",
+                                      user=NEO4J_USER, password=NEO4J_PASS,
+                                      response='counts', chunk_size=chunk_size,
+                                      partition_edges=partition_edges)
+                self.assertEqual(result, {'nodes': 3, 'relationships': 4})
+
+    @httpretty.activate
+    def test_failed_chunk(self):
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+        requests = []
+
+        def request_callback(request, uri, headers):
+            requests.append(request.body)
+            return (500, headers, 'out of memory')
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        self.assertRaises(Exception, write_to_neo,
+                          "http://localhost:7474/db/data/",
+                          nx.path_graph(50), edge_rel_name="LINKS_TO",
+                          user=NEO4J_USER, password=NEO4J_PASS,
+                          chunk_size=1)
+        # the chunks after the failed one are not sent
+        self.assertEqual(len(requests), 1)
+
+    def test_invalid_response(self):
+        self.assertRaises(ValueError, write_to_neo,
+                          "http://localhost:7474/db/data/", nx.Graph(),
+                          edge_rel_name="LINKS_TO", user=NEO4J_USER,
+                          password=NEO4J_PASS, response='everything')
+
+
+class TestImapBounded(unittest.TestCase):
+
+    def test_backpressure(self):
+        from multiprocessing.pool import ThreadPool
+
+        lock = threading.Lock()
+        state = {'read': 0, 'done': 0}
+
+        def items():
+            for i in range(20):
+                with lock:
+                    # at most 2 items are being processed
+                    self.assertTrue(state['read'] - state['done'] <= 2)
+                    state['read'] += 1
+                yield i
+
+        def func(i):
+            time.sleep(0.01)
+            return i * 2
+
+        pool = ThreadPool(2)
+        try:
+            for i, result in enumerate(imap_bounded(pool, func, items(), 2)):
+                self.assertEqual(result, i * 2)
+                with lock:
+                    state['done'] += 1
+        finally:
+            pool.terminate()
+            pool.join()
+        self.assertEqual(state, {'read': 20, 'done': 20})
+
+
+class TestGetEdgeRounds(unittest.TestCase):
+
+    def test_rounds(self):
+        graph = nx.star_graph(4)
+        graph.add_edges_from([(5, 6), (6, 7)])
+        edges = list(graph.edges(data=True))
+
+        rounds = [list(batches) for batches in get_edge_rounds(edges, 2)]
+        self.assertEqual(rounds, [[edges[:2], edges[2:4], edges[4:]]])
+
+        rounds = [list(batches)
+                  for batches in get_edge_rounds(edges, 2, True)]
+        self.assertEqual(sorted(edge for batches in rounds
+                                for batch in batches for edge in batch),
+                         sorted(edges))
+        # the batches of a round can be sent concurrently without locking
+        # the same nodes
+        for batches in rounds:
+            nodes = [n for batch in batches
+                     for n in set(n for edge in batch for n in edge[:2])]
+            self.assertEqual(len(nodes), len(set(nodes)))
+
+
+def is_merge(ops):
+    """returns True, if the batch operations merge relationships."""
+    return ops[0]['to'] == '/cypher' and 'MERGE' in ops[0]['body']['query']
+
+
+class TestMerge(unittest.TestCase):
+
+    def register_batch(self, existing, fail_relationships=False):
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        self.requests = []
+
+        def request_callback(request, uri, headers):
+            ops = json.loads(request.body.decode('utf-8'))
+            self.requests.append(ops)
+            if fail_relationships and is_merge(ops):
+                return (500, headers, 'out of memory')
+            results = []
+            for op in ops:
+                if op['to'] == '/node':
+                    node_id = 100 + len(existing)
+                    existing[op['body']['key']] = node_id
+                    results.append({'id': op['id'], 'body': {'data': {}},
+                                    'location': 'http://localhost:7474/db/'
+                                    'data/node/{0}'.format(node_id)})
+                elif op['to'] == '/cypher' and 'keys' in op['body']['params']:
+                    keys = op['body']['params']['keys']
+                    results.append({'body': {'data': [
+                        [k, existing[k]] for k in keys if k in existing]}})
+                else:
+                    results.append({'body': None})
+            return (200, headers, json.dumps(results))
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+    def get_graph(self):
+        graph = nx.DiGraph()
+        graph.add_node('a', key='x')
+        graph.add_node('b', key='y')
+        graph.add_node('c', key='z', w=1)
+        graph.add_edge('a', 'b', type='KNOWS')
+        graph.add_edge('b', 'c')
+        graph.add_edge('c', 'a')
+        return graph
+
+    @httpretty.activate
+    def test_merge(self):
+        self.register_batch({'x': 10, 'z': 11})
+        result = write_to_neo("http://localhost:7474/db/data/",
+                              self.get_graph(), edge_rel_name="LINKS_TO",
+                              label="ITEM", edge_rel_key='type',
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              response='ids', merge_key='key')
+        self.assertEqual(list(result), [10, 102, 11])
+
+        lookup, upsert, merge = self.requests
+        self.assertEqual(lookup[0]['body']['params'],
+                         {'keys': ['x', 'y', 'z']})
+        self.assertTrue('MATCH (n:`ITEM`) WHERE n.`key` IN' in
+                        lookup[0]['body']['query'])
+
+        # only the missing node is created, the others are updated
+        self.assertEqual([op['to'] for op in upsert],
+                         ['/node', '{0}/labels', '/cypher'])
+        self.assertEqual(upsert[2]['body']['params']['rows'],
+                         [{'id': 10, 'properties': {'key': 'x'}},
+                          {'id': 11, 'properties': {'key': 'z', 'w': 1}}])
+
+        # relationships are merged with one query per name
+        self.assertEqual(len(merge), 2)
+        self.assertTrue('MERGE (a)-[r:`KNOWS`]->(b)' in
+                        merge[0]['body']['query'])
+        self.assertEqual(
+            [row['from'] for row in merge[0]['body']['params']['rows']],
+            [10])
+        self.assertEqual(
+            sorted((row['from'], row['to'])
+                   for row in merge[1]['body']['params']['rows']),
+            [(11, 10), (102, 11)])
+
+    @httpretty.activate
+    def test_merge_counts(self):
+        self.register_batch({'x': 10})
+        graph = self.get_graph().to_undirected()
+        result = write_to_neo("http://localhost:7474/db/data/", graph,
+                              edge_rel_name="LINKS_TO", label="ITEM",
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              response='counts', merge_key='key',
+                              chunk_size=2)
+        self.assertEqual(result, {'nodes': 2, 'relationships': 6})
+
+    @httpretty.activate
+    def test_merge_key_in_several_chunks(self):
+        existing = {}
+        self.register_batch(existing)
+        graph = nx.DiGraph()
+        graph.add_node('a', key='x')
+        graph.add_node('b', key='x')
+        graph.add_node('c', key='y')
+        result = write_to_neo("http://localhost:7474/db/data/", graph,
+                              edge_rel_name="LINKS_TO", label="ITEM",
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              response='ids', merge_key='key',
+                              chunk_size=1, workers=2)
+        self.assertEqual(list(result), [100, 100, 101])
+        self.assertEqual(existing, {'x': 100, 'y': 101})
+
+    @httpretty.activate
+    def test_failed_relationships(self):
+        self.register_batch({}, fail_relationships=True)
+        self.assertRaises(Exception, write_to_neo,
+                          "http://localhost:7474/db/data/", self.get_graph(),
+                          edge_rel_name="LINKS_TO", label="ITEM",
+                          user=NEO4J_USER, password=NEO4J_PASS,
+                          merge_key='key', chunk_size=1)
+        # the relationship chunks after the failed one are not sent
+        self.assertEqual(len([ops for ops in self.requests
+                              if is_merge(ops)]), 1)
+
+    def test_missing_merge_key(self):
+        graph = nx.Graph()
+        graph.add_node(1)
+        self.assertRaises(ValueError, get_merge_keys, graph.nodes(data=True),
+                          'key')
+
+    def test_missing_label(self):
+        # without a label, each lookup would scan the whole database
+        self.assertRaises(ValueError, write_to_neo,
+                          "http://localhost:7474/db/data/", self.get_graph(),
+                          edge_rel_name="LINKS_TO", user=NEO4J_USER,
+                          password=NEO4J_PASS, merge_key='key')
+
+
+class TestClearLabel(unittest.TestCase):
+
+    def register_batch(self, remaining):
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        self.queries = []
+
+        def request_callback(request, uri, headers):
+            results = []
+            for op in json.loads(request.body.decode('utf-8')):
+                if op['to'] == '/node':
+                    results.append({'id': op['id'], 'body': None,
+                                    'location': 'http://localhost:7474/db/'
+                                    'data/node/1'})
+                    continue
+                elif op['to'] != '/cypher':
+                    results.append({'body': None})
+                    continue
+                query = op['body']['query']
+                self.queries.append(query)
+                kind = 'nodes' if 'DELETE n ' in query else 'relationships'
+                label = query.split(':', 1)[1].split(')', 1)[0]
+                deleted = 0
+                if 'LIMIT' in query:
+                    left = remaining.get((label, kind), 0)
+                    deleted = min(left, op['body']['params']['limit'])
+                    remaining[(label, kind)] = left - deleted
+                results.append({'body': {'data': [[deleted]]}})
+            return (200, headers, json.dumps(results))
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+    @httpretty.activate
+    def test_clear_label(self):
+        self.register_batch({('`Person`', 'relationships'): 5,
+                             ('`Person`', 'nodes'): 3})
+        calls = []
+        counts = clear_label("http://localhost:7474/db/data/", 'Person',
+                             user=NEO4J_USER, password=NEO4J_PASS,
+                             batch_size=2,
+                             progress=lambda *args: calls.append(args))
+
+        self.assertEqual(counts, {'nodes': 3, 'relationships': 5})
+        self.assertEqual(calls, [('relationships', 2), ('relationships', 2),
+                                 ('relationships', 1), ('nodes', 2),
+                                 ('nodes', 1)])
+        self.assertEqual(len(self.queries), 5)
+
+    @httpretty.activate
+    def test_invalid_batch_size(self):
+        self.register_batch({('`Person`', 'nodes'): 3})
+        for batch_size in (0, -1):
+            self.assertRaises(ValueError, clear_label,
+                              "http://localhost:7474/db/data/", 'Person',
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              batch_size=batch_size)
+        self.assertEqual(self.queries, [])
+
+    @httpretty.activate
+    def test_replace_label(self):
+        self.register_batch({('`Person_staging`', 'nodes'): 1,
+                             ('`Person_retired`', 'nodes'): 2})
+        calls = []
+        graph = nx.Graph()
+        graph.add_node(1)
+        replace_label("http://localhost:7474/db/data/", graph,
+                      user=NEO4J_USER, password=NEO4J_PASS, label='Person',
+                      edge_rel_name='KNOWS', batch_size=10, chunk_size=10,
+                      progress=lambda *args: calls.append(args))
+
+        self.assertEqual(
+            [q for q in self.queries if 'LIMIT' not in q],
+            ['MATCH (n:`Person`) SET n:`Person_retired` REMOVE n:`Person`;',
+             'MATCH (n:`Person_staging`) SET n:`Person` '
+             'REMOVE n:`Person_staging`;'])
+        self.assertEqual(calls, [('deleted nodes', 1), ('nodes', 1),
+                                 ('deleted nodes', 2)])
+        # the staging label is cleared first, the retired label last
+        self.assertTrue('`Person_staging`' in self.queries[0])
+        self.assertTrue('`Person_retired`' in self.queries[-1])
+
+
 class TestGetGraph(unittest.TestCase):
 
     @httpretty.activate
@@ -181,6 +559,236 @@ class TestGetGraph(unittest.TestCase):
         self.assertEqual(graph.edge[1][2]['neo_rel_name'], "LINKS_TO")
         self.assertEqual(graph.edge[1][2]['date'], "2011-01-01")
 
+    @httpretty.activate
+    def test_get_digraph_filtered(self):
+        node_data = [[1, {"data": {"name": "b", "age": None}}],
+                     [2, {"data": {"name": "a", "age": 30}}]]
+        edge_data = [[1, {"data": {}, "type": "KNOWS"}, 2]]
+        truth = [{"body": {"data": node_data}},
+                 {"body": {"data": edge_data}}]
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=json.dumps(truth),
+                               content_type='application/json; charset=UTF-8')
+
+        graph = get_neo_graph("http://localhost:7474/db/data/", "Node",
+                              user=NEO4J_USER, password=NEO4J_PASS,
+                              node_properties=['name', 'age'],
+                              edge_properties=[], rel_types=['KNOWS'],
+                              where='n.age > {age}', params={'age': 18})
+
+        ops = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual(ops[0]['to'], '/cypher')
+        self.assertEqual(ops[0]['body']['params'], {'age': 18})
+        self.assertTrue('{`name`: n.`name`, `age`: n.`age`}' in
+                        ops[0]['body']['query'])
+        self.assertTrue('[r:`KNOWS`]' in ops[1]['body']['query'])
+        self.assertTrue('(n.age > {age})' in ops[1]['body']['query'])
+
+        nodes = dict(graph.nodes(data=True))
+        self.assertEqual(nodes[1], {"name": "b"})
+        self.assertEqual(nodes[2], {"name": "a", "age": 30})
+        self.assertEqual(graph.get_edge_data(1, 2), {'neo_rel_name': 'KNOWS'})
+
+    def test_filter_queries_default(self):
+        ops = get_filter_queries('Node')
+        self.assertEqual(ops[0], {"method": "GET", "to": '/label/Node/nodes',
+                                  "body": {}})
+        self.assertEqual(ops[1]['body']['query'],
+                         LABEL_QRY.format('Node', 'Node'))
+
+    @httpretty.activate
+    def test_get_digraph_cached(self):
+        node_data = [{"data": {"name": "b"},
+                     "self": "http://localhost:7474/db/data/node/1"}]
+        marker = [{"body": {"data": [[1, 1]]}},
+                  {"body": {"data": [[0]]}}]
+        graph_data = [{"body": node_data}, {"body": {"data": []}}]
+        bodies = [marker, graph_data, marker]
+
+        def request_callback(request, uri, headers):
+            return (200, headers, json.dumps(bodies.pop(0)))
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = GraphCache(directory)
+            for _ in range(2):
+                graph = get_neo_graph("http://localhost:7474/db/data/",
+                                      "Node", user=NEO4J_USER,
+                                      password=NEO4J_PASS, cache=cache)
+                self.assertEqual(dict(graph.nodes(data=True)),
+                                 {1: {"name": "b"}})
+        finally:
+            shutil.rmtree(directory)
+
+        # the second call only asked for the marker
+        self.assertEqual(bodies, [])
+
+    @httpretty.activate
+    def test_get_arrays(self):
+        node_data = [{"data": {"name": "b"},
+                     "self": "http://localhost:7474/db/data/node/7"},
+                     {"data": {"name": "a", "age": 3},
+                      "self": "http://localhost:7474/db/data/node/5"}]
+        edge_data = [[5, {"data": {"w": 2}, "type": "LINKS_TO"}, 7],
+                     [7, {"data": {}, "type": "LINKS_TO"}, 5],
+                     [5, {"data": {"w": 1}, "type": "KNOWS"}, 5]]
+        truth = [{"body": node_data}, {"body": {"data": edge_data}}]
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=json.dumps(truth),
+                               content_type='application/json; charset=UTF-8')
+
+        arrays = get_neo_graph("http://localhost:7474/db/data/", "Node",
+                               user=NEO4J_USER, password=NEO4J_PASS,
+                               output='arrays')
+
+        self.assertTrue(isinstance(arrays, EdgeArrays))
+        self.assertEqual(list(arrays.node_ids), [7, 5])
+        self.assertEqual(list(arrays.indptr), [0, 1, 3])
+        self.assertEqual(list(arrays.source), [0, 1, 1])
+        self.assertEqual(list(arrays.target), [1, 0, 1])
+        self.assertEqual(arrays.node_properties,
+                         {'name': ['b', 'a'], 'age': [None, 3]})
+        self.assertEqual(arrays.edge_properties,
+                         {'w': [None, 2, 1],
+                          'neo_rel_name': ['LINKS_TO', 'LINKS_TO', 'KNOWS']})
+
+    def test_large_ids(self):
+        # Neo4j IDs may exceed 32 bits
+        arrays = get_edge_arrays([(2 ** 40, {}), (2 ** 33, {})],
+                                 [(2 ** 40, 2 ** 33, {})])
+        self.assertEqual(list(arrays.node_ids), [2 ** 40, 2 ** 33])
+
+    def test_invalid_output(self):
+        self.assertRaises(ValueError, get_neo_graph,
+                          "http://localhost:7474/db/data/", "Node",
+                          user=NEO4J_USER, password=NEO4J_PASS,
+                          output='matrix')
+
+
+class TestGetSubgraph(unittest.TestCase):
+
+    @httpretty.activate
+    def test_get_subgraph(self):
+        seed_data = [{"body": {"data": [[1, {"data": {"name": "a"}}]]}}]
+        hop_1 = [{"body": {"data": [
+            [1, {"data": {}, "type": "KNOWS"}, 2, 2, {"data": {"name": "b"}}],
+            [3, {"data": {"w": 1}, "type": "KNOWS"}, 1,
+             3, {"data": {"name": "c"}}]]}}]
+        hop_2 = [{"body": {"data": [
+            [2, {"data": {}, "type": "KNOWS"}, 3, 3, {"data": {"name": "c"}}],
+            [2, {"data": {}, "type": "KNOWS"}, 1, 1, {"data": {"name": "a"}}]
+        ]}}, {"body": {"data": []}}]
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        requests = []
+        bodies = [seed_data, hop_1, hop_2]
+
+        def request_callback(request, uri, headers):
+            requests.append(json.loads(request.body.decode('utf-8')))
+            return (200, headers, json.dumps(bodies.pop(0)))
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        graph = get_neo_subgraph("http://localhost:7474/db/data/", ['a'],
+                                 user=NEO4J_USER, password=NEO4J_PASS,
+                                 depth=2, rel_types=['KNOWS'], key='name',
+                                 label='Person', batch_size=1)
+
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(requests[0][0]['body']['params'], {'keys': ['a']})
+        self.assertTrue('n.`name`' in requests[0][0]['body']['query'])
+        self.assertTrue('-[r:`KNOWS`]-(b:`Person`)' in
+                        requests[1][0]['body']['query'])
+        # the second hop only expands the nodes found in the first hop
+        self.assertEqual([op['body']['params']['ids'] for op in requests[2]],
+                         [[2], [3]])
+
+        self.assertEqual(dict(graph.nodes(data=True)),
+                         {1: {'name': 'a'}, 2: {'name': 'b'},
+                          3: {'name': 'c'}})
+        self.assertEqual(sorted(graph.edges()),
+                         [(1, 2), (2, 1), (2, 3), (3, 1)])
+        self.assertEqual(graph.get_edge_data(3, 1),
+                         {'w': 1, 'neo_rel_name': 'KNOWS'})
+
+    @httpretty.activate
+    def test_get_subgraph_last_hop_edges(self):
+        seed_data = [{"body": {"data": [[1, {"data": {}}]]}}]
+        hop_1 = [{"body": {"data": [
+            [1, {"data": {}, "type": "KNOWS"}, 2, 2, {"data": {}}],
+            [1, {"data": {}, "type": "KNOWS"}, 3, 3, {"data": {}}]]}}]
+        close = [{"body": {"data": [
+            [3, {"data": {}, "type": "KNOWS"}, 2]]}}]
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+
+        requests = []
+        bodies = [seed_data, hop_1, close]
+
+        def request_callback(request, uri, headers):
+            requests.append(json.loads(request.body.decode('utf-8')))
+            return (200, headers, json.dumps(bodies.pop(0)))
+
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        graph = get_neo_subgraph("http://localhost:7474/db/data/", [1],
+                                 user=NEO4J_USER, password=NEO4J_PASS,
+                                 direction='out')
+
+        # the edge between the two nodes of the last hop is fetched as well,
+        # with the set of nodes sent once
+        self.assertEqual(len(requests[2]), 1)
+        self.assertEqual(requests[2][0]['body']['params'],
+                         {'ids': [2, 3], 'nodes': [1, 2, 3]})
+        self.assertEqual(sorted(graph.edges()), [(1, 2), (1, 3), (3, 2)])
+
+        # in both directions, only the last hop's own IDs are sent
+        requests[:] = []
+        bodies.extend([seed_data, hop_1, close])
+        graph = get_neo_subgraph("http://localhost:7474/db/data/", [1],
+                                 user=NEO4J_USER, password=NEO4J_PASS,
+                                 batch_size=1)
+        self.assertEqual(len(requests[2]), 1)
+        self.assertEqual(requests[2][0]['body']['params'], {'ids': [2, 3]})
+        self.assertTrue('-[r]->(b) WHERE ID(b) IN {ids}' in
+                        requests[2][0]['body']['query'])
+        self.assertEqual(sorted(graph.edges()), [(1, 2), (1, 3), (3, 2)])
+
+    def test_invalid_direction(self):
+        self.assertRaises(ValueError, get_neo_subgraph,
+                          "http://localhost:7474/db/data/", [1],
+                          user=NEO4J_USER, password=NEO4J_PASS,
+                          direction='sideways')
+
 
 class TestEdgeLabels(unittest.TestCase):
     def setUp(self):
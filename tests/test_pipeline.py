@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_pipeline
+----------------------------------
+
+Tests for `pipeline` module.
+"""
+
+import json
+import threading
+import time
+import unittest
+
+from neonx.pipeline import Pipeline, write_to_neo_pipelined
+
+import httpretty
+import networkx as nx
+
+
+BATCH_URL = '{"batch":"http://localhost:7474/db/data/batch"}'
+
+
+class ImmediateResult(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class ImmediatePool(object):
+
+    def apply_async(self, func, args):
+        return ImmediateResult(func(*args))
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_backpressure(self):
+        waiting = []
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def send(data):
+            release.wait()
+            return data
+
+        def done(index, item, result):
+            with lock:
+                waiting.append((index, item, result))
+
+        def items():
+            for i in range(10):
+                # at most 2 chunks are being sent and 1 is waiting
+                with lock:
+                    self.assertTrue(i - len(waiting) <= 3)
+                yield i
+
+        pipeline = Pipeline(ImmediatePool(), send, 2, 1)
+        threading.Timer(1, release.set).start()
+        pipeline.run(lambda i: i * 2, items(), done)
+
+        self.assertEqual(sorted(waiting),
+                         [(i, i, i * 2) for i in range(10)])
+
+    def test_error(self):
+        def send(data):
+            if data == 3:
+                raise ValueError('server error')
+            time.sleep(0.01)
+            return data
+
+        pipeline = Pipeline(ImmediatePool(), send, 2, 1)
+        self.assertRaises(ValueError, pipeline.run, lambda i: i,
+                          iter(range(100)), lambda *args: None)
+
+
+class TestWriteToNeoPipelined(unittest.TestCase):
+
+    @httpretty.activate
+    def test_write(self):
+        requests = []
+        lock = threading.Lock()
+
+        def request_callback(request, uri, headers):
+            data = json.loads(request.body.decode('utf-8'))
+            with lock:
+                requests.append(data)
+            results = [{'id': op['id'],
+                        'location': 'http://localhost:7474/db/data/node/'
+                        '{0}'.format(100 + op['body']['n'])}
+                       for op in data if op['to'] == '/node']
+            results.extend({'location': 'http://localhost:7474/db/data/'
+                            'relationship/1'}
+                           for op in data if op['to'] != '/node')
+            return (200, headers, json.dumps(results))
+
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=request_callback)
+
+        graph = nx.path_graph(7, create_using=nx.DiGraph())
+        for n in graph:
+            graph.add_node(n, n=n)
+
+        # httpretty is not thread-safe, so each upload uses one sender;
+        # concurrent senders are covered by TestPipeline
+        ids = write_to_neo_pipelined("http://localhost:7474/db/data/",
+                                     graph, 'neo4j', 'secret', 'LINK_TO',
+                                     chunk_size=2, processes=2, senders=1,
+                                     queue_size=1, response='ids')
+        self.assertEqual(list(ids), [100 + n for n in range(7)])
+
+        edges = sorted((op['to'], op['body']['to'])
+                       for data in requests for op in data
+                       if op['to'] != '/node')
+        self.assertEqual(edges, sorted(
+            ('/node/{0}/relationships'.format(100 + u),
+             '/node/{0}'.format(100 + v)) for u, v in graph.edges()))
+
+        counts = write_to_neo_pipelined("http://localhost:7474/db/data/",
+                                        graph, 'neo4j', 'secret', 'LINK_TO',
+                                        chunk_size=3, processes=1,
+                                        senders=1, response='counts')
+        self.assertEqual(counts, {'nodes': 7, 'relationships': 6})
+
+
+if __name__ == '__main__':
+    unittest.main()
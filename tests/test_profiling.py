@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_profiling
+----------------------------------
+
+Tests for `profiling` module.
+"""
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+
+from neonx.neo import write_to_neo
+from neonx.profiling import Profiler
+
+import httpretty
+import networkx as nx
+
+
+BATCH_URL = '{"batch":"http://localhost:7474/db/data/batch"}'
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_phases(self):
+        path = os.path.join(self.directory, 'neonx.prof')
+        profiler = Profiler(cprofile_path=path)
+        for _ in range(2):
+            with profiler.phase('outer'):
+                with profiler.phase('inner'):
+                    data = [0] * 100000
+                del data
+        summary = profiler.summary()
+
+        self.assertEqual(list(summary['phases']), ['inner', 'outer'])
+        inner, outer = summary['phases']['inner'], summary['phases']['outer']
+        self.assertEqual(inner['calls'], 2)
+        self.assertTrue(inner['peak_memory'] >= 800000)
+        # the enclosing phase includes the peak of the inner one
+        self.assertTrue(outer['peak_memory'] >= inner['peak_memory'])
+        self.assertTrue(outer['memory'] < 800000)
+        self.assertTrue(outer['wall'] >= inner['wall'])
+        self.assertEqual(summary['peak_memory'], outer['peak_memory'])
+        self.assertEqual(summary['cprofile'], path)
+        self.assertFalse(summary['concurrent'])
+        self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+        lines = profiler.report().splitlines()
+        self.assertEqual(lines[0].split(),
+                         ['phase', 'calls', 'wall', 'cpu', 'peak',
+                          'allocated'])
+        self.assertEqual(lines[-1].split()[0], 'total')
+
+    def test_concurrent_phases(self):
+        profiler = Profiler()
+        freed = threading.Event()
+        done = threading.Event()
+
+        def other():
+            freed.wait()
+            with profiler.phase('other'):
+                pass
+            done.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        with profiler.phase('work'):
+            data = [0] * 100000
+            del data
+            freed.set()
+            done.wait()
+        thread.join()
+
+        # the other thread's phase does not reset the peak of this one
+        summary = profiler.summary()
+        self.assertTrue(summary['phases']['work']['peak_memory'] >= 800000)
+        self.assertTrue(summary['concurrent'])
+        self.assertTrue('concurrently' in profiler.report())
+
+    def test_without_memory(self):
+        profiler = Profiler(memory=False)
+        with profiler.phase('work'):
+            pass
+        self.assertEqual(profiler.summary()['peak_memory'], None)
+        self.assertTrue(' - ' in profiler.report())
+
+    @httpretty.activate
+    def test_write_to_neo(self):
+        httpretty.register_uri(httpretty.GET,
+                               "http://localhost:7474/db/data/",
+                               body=BATCH_URL)
+        httpretty.register_uri(httpretty.POST,
+                               "http://localhost:7474/db/data/batch",
+                               body=json.dumps([{'id': 0}]))
+
+        profiler = Profiler()
+        write_to_neo("http://localhost:7474/db/data/", nx.path_graph(1),
+                     'neo4j', 'secret', edge_rel_name='LINKS_TO',
+                     profiler=profiler)
+        self.assertEqual(list(profiler.summary()['phases']),
+                         ['build', 'encode', 'request', 'parse'])
+
+
+if __name__ == '__main__':
+    unittest.main()
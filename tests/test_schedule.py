@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_schedule
+----------------------------------
+
+Tests for `schedule` module.
+"""
+
+import unittest
+
+from neonx.schedule import schedule_edges
+
+import networkx as nx
+
+
+class TestScheduleEdges(unittest.TestCase):
+
+    def check_schedule(self, edges, rounds, batch_size):
+        scheduled = [edge for batches in rounds for batch in batches
+                     for edge in batch]
+        self.assertEqual(sorted(scheduled), sorted(edges))
+
+        for batches in rounds:
+            seen = set()
+            for batch in batches:
+                self.assertTrue(0 < len(batch) <= batch_size)
+                nodes = set(e[0] for e in batch) | set(e[1] for e in batch)
+                self.assertFalse(nodes & seen)
+                seen |= nodes
+
+    def test_disjoint(self):
+        graph = nx.gnm_random_graph(200, 1000, seed=42, directed=True)
+        edges = list(graph.edges(data=True))
+        rounds = schedule_edges(edges, 20)
+        self.check_schedule(edges, rounds, 20)
+
+    def test_hubs(self):
+        graph = nx.star_graph(50)
+        graph.add_edges_from([(100, 101), (101, 102), (1, 2)])
+        edges = list(graph.edges(data=True))
+        rounds = schedule_edges(edges, 10)
+        self.check_schedule(edges, rounds, 10)
+
+        # the 50 edges of the hub are split into 5 batches in 5 rounds
+        hub_batches = [batch for batches in rounds for batch in batches
+                       if any(0 in e[:2] for e in batch)]
+        self.assertEqual(len(hub_batches), 5)
+        self.assertEqual(len(rounds), 5)
+        for batch in hub_batches:
+            self.assertTrue(all(0 in e[:2] for e in batch))
+
+    def test_empty(self):
+        self.assertEqual(schedule_edges([], 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_source
+----------------------------------
+
+Tests for `source` module.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from neonx import get_geoff
+from neonx.neo import generate_data
+from neonx.source import GraphSource, as_source, read_edgelist, read_csv
+
+import networkx as nx
+
+
+class TestGraphSource(unittest.TestCase):
+
+    def test_nodes_from_edges(self):
+        source = GraphSource(edges=(e for e in [(1, 2), (2, 3, {'w': 1})]))
+        self.assertEqual(list(source.nodes()), [(1, {}), (2, {}), (3, {})])
+        # the generator was copied, so it can be iterated again
+        self.assertEqual(list(source.edges()),
+                         [(1, 2, {}), (2, 3, {'w': 1})])
+
+    def test_nodes(self):
+        source = GraphSource(nodes=[(0, 1), ((1, 2), {'a': 1})])
+        self.assertEqual(list(source.nodes()),
+                         [((0, 1), {}), ((1, 2), {'a': 1})])
+
+    def test_as_source(self):
+        graph = nx.balanced_tree(2, 1)
+        self.assertFalse(as_source(graph).is_directed())
+        self.assertTrue(as_source(nx.DiGraph(graph)).is_directed())
+
+        source = GraphSource()
+        self.assertTrue(as_source(source) is source)
+
+    def test_get_geoff(self):
+        graph = nx.balanced_tree(2, 1, create_using=nx.DiGraph())
+        source = GraphSource(nodes=lambda: iter([0, 1, 2]),
+                             edges=lambda: iter([(0, 1), (0, 2)]))
+        self.assertEqual(get_geoff(source, 'LINK_TO'),
+                         get_geoff(graph, 'LINK_TO'))
+
+    def test_generate_data(self):
+        graph = nx.balanced_tree(2, 1)
+        source = GraphSource(nodes=[0, 1, 2], edges=[(0, 1), (0, 2)],
+                             directed=False)
+        encoder = json.JSONEncoder()
+        self.assertEqual(generate_data(source, 'LINK_TO', 'ITEM', encoder),
+                         generate_data(graph, 'LINK_TO', 'ITEM', encoder))
+
+
+class TestReaders(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_edgelist(self):
+        path = os.path.join(self.directory, 'edges.txt.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(b'# comment\n1 2\n\n2 3 {"w": 0.5}\n')
+
+        source = read_edgelist(path, nodetype=int)
+        self.assertEqual(list(source.nodes()), [(1, {}), (2, {}), (3, {})])
+        self.assertEqual(list(source.edges()),
+                         [(1, 2, {}), (2, 3, {'w': 0.5})])
+
+    def test_read_csv(self):
+        edges_path = os.path.join(self.directory, 'edges.csv')
+        nodes_path = os.path.join(self.directory, 'nodes.csv')
+        with open(edges_path, 'w') as f:
+            f.write('source,target,since\n1,2,2011\n2,1,\n')
+        with open(nodes_path, 'w') as f:
+            f.write('id,name\n1,a\n2,b\n')
+
+        source = read_csv(edges_path, nodes_path=nodes_path, nodetype=int)
+        self.assertEqual(list(source.nodes()),
+                         [(1, {'name': 'a'}), (2, {'name': 'b'})])
+        self.assertEqual(list(source.edges()),
+                         [(1, 2, {'since': '2011'}), (2, 1, {})])
+
+
+if __name__ == '__main__':
+    unittest.main()